@@ -0,0 +1,97 @@
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+
+from lseval.datatypes import DocTimeRel, Entity
+
+
+# Entity as it was before it was slotted,
+# kept here only as the point of comparison
+@dataclass(eq=True, frozen=True)
+class UnslottedEntity:
+    file_id: int
+    label_studio_id: str
+    span: tuple[int, int]
+    text: str | None = field(compare=False)
+    dtr: DocTimeRel | None = field(compare=False)
+    label: str | None = field(compare=False)
+    cuis: tuple[str, ...]
+    source_annotations: tuple[str, ...]
+
+
+def synthetic_entity_fields(
+    total_entities: int, entities_per_file: int, seed: int
+) -> Iterator[tuple]:
+    rng = random.Random(seed)
+    labels = ("Adverse Event", "Radiotherapy Treatment", "Site", "Date", "Boost")
+    for index in range(total_entities):
+        start = rng.randrange(10_000)
+        yield (
+            index // entities_per_file,
+            # Label Studio ids are 10 character strings
+            f"{index:010x}",
+            (start, start + rng.randint(1, 30)),
+            None,
+            rng.choice(tuple(DocTimeRel)),
+            # Parsing gives each annotation its own label string
+            rng.choice(labels).encode().decode(),
+            (),
+            (),
+        )
+
+
+# Counts everything the entities keep alive, fields are generated
+# inside the measurement since e.g. the label strings are allocated
+# per annotation and only retained if the representation keeps them
+def measure_bytes_per_object(
+    entity_type: Callable[..., object], entity_fields: Iterable[tuple]
+) -> float:
+    gc.collect()
+    tracemalloc.start()
+    entities = [entity_type(*fields) for fields in entity_fields]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # don't count the list holding them
+    retained = allocated - entities.__sizeof__()
+    total_entities = len(entities)
+    del entities
+    return retained / total_entities
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-object memory of Entity vs the previous unslotted dataclass"
+    )
+    parser.add_argument("--entities", type=int, default=1_000_000)
+    parser.add_argument("--entities-per-file", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    unslotted_bytes = measure_bytes_per_object(
+        UnslottedEntity,
+        synthetic_entity_fields(args.entities, args.entities_per_file, args.seed),
+    )
+    slotted_bytes = measure_bytes_per_object(
+        Entity,
+        synthetic_entity_fields(args.entities, args.entities_per_file, args.seed),
+    )
+    print(
+        json.dumps(
+            {
+                "benchmark": "entity_memory",
+                "entities": args.entities,
+                "unslotted_bytes_per_entity": unslotted_bytes,
+                "slotted_bytes_per_entity": slotted_bytes,
+                "ratio": unslotted_bytes / slotted_bytes,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import json
+import random
+import timeit
+
+from lseval.datatypes import overlap_exists, paired_overlap_exists
+
+
+def random_span(rng: random.Random, text_length: int) -> tuple[int, int]:
+    start = rng.randrange(text_length)
+    return start, start + rng.randint(1, 20)
+
+
+def random_distinct_span_pair(
+    rng: random.Random, text_length: int
+) -> tuple[tuple[int, int], tuple[int, int]]:
+    first = random_span(rng, text_length)
+    second = random_span(rng, text_length)
+    while second == first:
+        second = random_span(rng, text_length)
+    return first, second
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-call time of overlap_exists vs paired_overlap_exists"
+    )
+    parser.add_argument("--cases", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--text-length", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Agreement between the two is checked in tests/test_datatypes.py
+    rng = random.Random(args.seed)
+    cases = [
+        (
+            random_distinct_span_pair(rng, args.text_length),
+            random_distinct_span_pair(rng, args.text_length),
+        )
+        for _ in range(args.cases)
+    ]
+
+    def run_general() -> None:
+        for first, second in cases:
+            overlap_exists(set(first), set(second))
+
+    def run_paired() -> None:
+        for first, second in cases:
+            paired_overlap_exists(*first, *second)
+
+    general_seconds = min(timeit.repeat(run_general, number=1, repeat=args.repeat))
+    paired_seconds = min(timeit.repeat(run_paired, number=1, repeat=args.repeat))
+    print(
+        json.dumps(
+            {
+                "benchmark": "overlap_exists",
+                "cases": args.cases,
+                "general_ns_per_call": 1e9 * general_seconds / args.cases,
+                "paired_ns_per_call": 1e9 * paired_seconds / args.cases,
+                "speedup": general_seconds / paired_seconds,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
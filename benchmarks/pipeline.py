@@ -0,0 +1,171 @@
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import asdict, fields
+from statistics import mean
+
+from lseval.adjudication import build_adjudication_file
+from lseval.score import (
+    build_entity_correctness_matrix,
+    build_relation_correctness_matrix,
+    pair_files_by_id,
+)
+from lseval.utils import organize_corpus_annotations_by_annotator
+
+from .synthetic import SyntheticCorpusParameters, synthetic_export
+
+REFERENCE = "reference"
+PREDICTION = "prediction"
+
+
+def time_stage(stage: Callable[[], object], repeat: int) -> Mapping[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+    return {"min_seconds": min(timings), "mean_seconds": mean(timings)}
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    parameters: SyntheticCorpusParameters, repeat: int
+) -> Mapping[str, object]:
+    raw_corpus = synthetic_export(parameters)
+    id_to_annotator = {1: REFERENCE, 2: PREDICTION}
+    # Any further annotators are skipped before parsing
+    ignored_annotator_ids = list(range(3, parameters.total_annotators + 1))
+
+    def parse():
+        return organize_corpus_annotations_by_annotator(
+            raw_corpus, id_to_annotator, ignored_annotator_ids
+        )
+
+    annotator_to_corpus = parse()
+    file_pairs = [
+        (predicted_file, reference_file)
+        for predicted_file, reference_file in pair_files_by_id(
+            annotator_to_corpus[PREDICTION], annotator_to_corpus[REFERENCE]
+        ).values()
+        if predicted_file is not None and reference_file is not None
+    ]
+
+    def score_entities(overlap: bool) -> Callable[[], object]:
+        return lambda: [
+            build_entity_correctness_matrix(
+                predicted_file.entities, reference_file.entities, overlap=overlap
+            )
+            for predicted_file, reference_file in file_pairs
+        ]
+
+    def score_relations(overlap: bool) -> Callable[[], object]:
+        return lambda: [
+            build_relation_correctness_matrix(
+                predicted_file.relations, reference_file.relations, overlap=overlap
+            )
+            for predicted_file, reference_file in file_pairs
+        ]
+
+    file_matrices = [
+        (
+            reference_file,
+            build_entity_correctness_matrix(
+                predicted_file.entities, reference_file.entities, overlap=True
+            ),
+            build_relation_correctness_matrix(
+                predicted_file.relations, reference_file.relations, overlap=True
+            ),
+        )
+        for predicted_file, reference_file in file_pairs
+    ]
+
+    def adjudicate():
+        return [
+            build_adjudication_file(
+                file_id=reference_file.file_id,
+                file_text=reference_file.file_text,
+                total_files=len(file_matrices),
+                reference_annotator=REFERENCE,
+                prediction_annotator=PREDICTION,
+                entity_correctness_matrices=(entity_matrix,),
+                relation_correctness_matrices=(relation_matrix,),
+            )
+            for reference_file, entity_matrix, relation_matrix in file_matrices
+        ]
+
+    stages = {
+        "organize_corpus_annotations_by_annotator": parse,
+        "exact_entity_scoring": score_entities(overlap=False),
+        "overlap_entity_scoring": score_entities(overlap=True),
+        "exact_relation_scoring": score_relations(overlap=False),
+        "overlap_relation_scoring": score_relations(overlap=True),
+        "build_adjudication_file": adjudicate,
+    }
+    return {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "parameters": asdict(parameters),
+        "corpus": {
+            "tasks": len(raw_corpus),
+            "scored_files": len(file_pairs),
+            "reference_entities": sum(
+                len(reference_file.entities) for _, reference_file in file_pairs
+            ),
+            "reference_relations": sum(
+                len(reference_file.relations) for _, reference_file in file_pairs
+            ),
+        },
+        "stages": {
+            name: time_stage(stage, repeat=repeat) for name, stage in stages.items()
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time parsing, scoring and adjudication on a synthetic corpus"
+    )
+    for parameter in fields(SyntheticCorpusParameters):
+        parser.add_argument(
+            f"--{parameter.name.replace('_', '-')}",
+            type=type(parameter.default),
+            default=parameter.default,
+        )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    args = parser.parse_args()
+    # Overlap scoring warns about shared spans, not what's being measured
+    logging.disable(logging.WARNING)
+
+    parameters = SyntheticCorpusParameters(
+        **{
+            parameter.name: getattr(args, parameter.name)
+            for parameter in fields(SyntheticCorpusParameters)
+        }
+    )
+    results = json.dumps(run_benchmarks(parameters, repeat=args.repeat), indent=2)
+    if args.output is None:
+        print(results)
+    else:
+        with open(args.output, "w") as output_file:
+            output_file.write(results)
+            output_file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import random
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from string import ascii_lowercase
+
+from lseval.schema import CompiledSchema, TagKind, compile_label_config
+
+DEFAULT_SCHEMA = Path(__file__).resolve().parent.parent / "schema.xml"
+
+# Adjudication only, not something annotators produce
+ADJUDICATION_TAGS = ("IAA",)
+
+
+# Values of every tag of the given kind, as compiled by lseval itself
+# so the generator and the parser always agree on the label config
+def get_tag_values(
+    schema: CompiledSchema, kind: TagKind, ignored_names: Sequence[str]
+) -> Mapping[str, Sequence[str]]:
+    return {
+        name: decoder.values
+        for name, decoder in schema.from_name_to_decoder.items()
+        if decoder.kind == kind and name not in ignored_names
+    }
+
+
+def get_relation_labels(
+    schema: CompiledSchema, ignored_names: Sequence[str]
+) -> Sequence[str]:
+    ignored_values = {
+        value
+        for name in ignored_names
+        if name in schema.from_name_to_decoder
+        for value in schema.from_name_to_decoder[name].values
+    }
+    return tuple(
+        label for label in schema.relation_labels if label not in ignored_values
+    )
+
+
+@dataclass(frozen=True)
+class SyntheticCorpusParameters:
+    total_tasks: int = 100
+    entities_per_task: int = 50
+    # Fraction of each annotator's entities whose offsets are
+    # nudged, i.e. overlap but don't exactly match the other annotator
+    overlap_density: float = 0.3
+    # Fraction of entities each annotator leaves out
+    drop_rate: float = 0.2
+    # Relations per entity
+    relation_density: float = 0.2
+    # Chance an entity gets each Choices / TextArea attribute
+    choice_rate: float = 0.6
+    text_area_rate: float = 0.4
+    total_annotators: int = 2
+    words_per_entity_gap: int = 6
+    seed: int = 0
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(ascii_lowercase, k=rng.randint(2, 9)))
+
+
+def synthetic_task(
+    task_id: int,
+    parameters: SyntheticCorpusParameters,
+    schema: CompiledSchema,
+    rng: random.Random,
+    ignored_names: Sequence[str] = ADJUDICATION_TAGS,
+) -> dict:
+    labels = get_tag_values(schema, TagKind.LABELS, ignored_names)
+    choices = get_tag_values(schema, TagKind.CHOICES, ignored_names)
+    text_areas = get_tag_values(schema, TagKind.TEXT_AREA, ignored_names)
+    relation_labels = get_relation_labels(schema, ignored_names)
+    # Entities are laid out left to right with some words between
+    # them, then each annotator gets a perturbed copy.  Region IDs
+    # are shared across annotators as they are when annotators
+    # start from the same preannotations
+    words = []
+    base_entities = []
+    position = 0
+    label_names = sorted(labels.keys())
+    for entity_index in range(parameters.entities_per_task):
+        for _ in range(rng.randint(1, parameters.words_per_entity_gap)):
+            word = random_word(rng)
+            words.append(word)
+            position += len(word) + 1
+        entity_words = [random_word(rng) for _ in range(rng.randint(1, 3))]
+        entity_text = " ".join(entity_words)
+        from_name = rng.choice(label_names)
+        base_entities.append(
+            {
+                "id": f"{task_id}_{entity_index}",
+                "start": position,
+                "end": position + len(entity_text),
+                "from_name": from_name,
+                "label": rng.choice(labels[from_name]),
+            }
+        )
+        words.append(entity_text)
+        position += len(entity_text) + 1
+    text = " ".join(words)
+
+    annotations = []
+    for annotator_id in range(1, parameters.total_annotators + 1):
+        result = []
+        region_ids = []
+        for base_entity in base_entities:
+            if rng.random() < parameters.drop_rate:
+                continue
+            start, end = base_entity["start"], base_entity["end"]
+            if rng.random() < parameters.overlap_density:
+                start = min(max(0, start + rng.randint(-2, 2)), end - 1)
+                end = max(start + 1, end + rng.randint(-2, 2))
+            region_id = base_entity["id"]
+            region_ids.append(region_id)
+            region = {
+                "id": region_id,
+                "to_name": "text",
+                "origin": "manual",
+            }
+            value = {"start": start, "end": end, "text": text[start:end]}
+            result.append(
+                {
+                    **region,
+                    "from_name": base_entity["from_name"],
+                    "type": "labels",
+                    "value": {**value, "labels": [base_entity["label"]]},
+                }
+            )
+            for choice_name, choice_values in choices.items():
+                if rng.random() < parameters.choice_rate:
+                    result.append(
+                        {
+                            **region,
+                            "from_name": choice_name,
+                            "type": "choices",
+                            "value": {**value, "choices": [rng.choice(choice_values)]},
+                        }
+                    )
+            for text_area_name in text_areas.keys():
+                if rng.random() < parameters.text_area_rate:
+                    result.append(
+                        {
+                            **region,
+                            "from_name": text_area_name,
+                            "type": "textarea",
+                            "value": {
+                                **value,
+                                "text": [f"C{rng.randrange(10_000_000):07d}"],
+                            },
+                        }
+                    )
+        total_relations = int(parameters.relation_density * len(region_ids))
+        seen_pairs = set()
+        for _ in range(total_relations if len(region_ids) > 1 else 0):
+            from_id, to_id = rng.sample(region_ids, 2)
+            if (from_id, to_id) in seen_pairs:
+                continue
+            seen_pairs.add((from_id, to_id))
+            result.append(
+                {
+                    "from_id": from_id,
+                    "to_id": to_id,
+                    "type": "relation",
+                    "direction": "right",
+                    "labels": [rng.choice(relation_labels)],
+                }
+            )
+        annotations.append({"completed_by": annotator_id, "result": result})
+    return {"id": task_id, "data": {"text": text}, "annotations": annotations}
+
+
+# Deterministic for given parameters (including the seed)
+def synthetic_export(
+    parameters: SyntheticCorpusParameters,
+    schema: CompiledSchema | None = None,
+) -> list[dict]:
+    rng = random.Random(parameters.seed)
+    if schema is None:
+        schema = compile_label_config(DEFAULT_SCHEMA)
+    return [
+        synthetic_task(task_id, parameters, schema, rng)
+        for task_id in range(1, parameters.total_tasks + 1)
+    ]
@@ -1,15 +1,22 @@
-import json
 import logging
 import operator
 import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
-from collections.abc import Collection, Iterable, Mapping, Sequence, Set
+from collections.abc import (
+    Collection,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+    Set,
+)
 from enum import Enum, EnumType, StrEnum
 from functools import partial, reduce
 from itertools import chain, groupby
 from operator import attrgetter, itemgetter
+from typing import Any
 
-from frozendict import deepfreeze
 from more_itertools import (
     flatten,
     map_reduce,
@@ -18,7 +25,10 @@ from more_itertools import (
 )
 
 from lseval.correctness_matrix import Correctness, CorrectnessMatrix
-from lseval.datatypes import Entity, Relation
+from lseval.datatypes import AnnotatedFile, Entity, Relation, SingleAnnotatorCorpus
+from lseval.instrumentation import increment, timed
+from lseval.schema import add_annotator_choices
+from lseval.score import map_file_pairs, pair_files_by_id, score_file_pair
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +50,9 @@ def update_schema(
     reference_annotator: str,
     prediction_annotator: str,
 ) -> ET.ElementTree | None:
-    raise NotImplementedError("TBD")
+    return add_annotator_choices(
+        current_schema, ("Agreement", reference_annotator, prediction_annotator)
+    )
 
 
 def relation_is_linked(entities: set[Entity], relation: Relation) -> bool:
@@ -69,22 +81,81 @@ def build_adjudication_file(
         relation_correctness_matrices=relation_correctness_matrices,
         filter_agreements=filter_agreements,
     )
+    # Preannotations are built once and reused, each of the
+    # correctness matrix iterables is only iterated over once
+    # so one-shot iterators are fine
     if filter_agreements and len(predictions) == 0:
         return None
     return {
         "id": file_id,
         "data": {"text": file_text},
-        "predictions": build_preannotations(
-            prediction_id=file_id + total_files,
-            reference_annotator=reference_annotator,
-            prediction_annotator=prediction_annotator,
-            entity_correctness_matrices=entity_correctness_matrices,
-            relation_correctness_matrices=relation_correctness_matrices,
-            filter_agreements=filter_agreements,
-        ),
+        "predictions": predictions,
     }
 
 
+def adjudicate_file_pair(
+    file_pair: tuple[AnnotatedFile | None, AnnotatedFile | None],
+    total_files: int,
+    reference_annotator: str,
+    prediction_annotator: str,
+    overlap: bool,
+    filter_agreements: bool = True,
+) -> dict | None:
+    predicted_file, reference_file = file_pair
+    annotated_file = reference_file if reference_file is not None else predicted_file
+    if annotated_file is None:
+        raise ValueError("File pair with neither a prediction nor a reference file")
+    entity_correctness_matrix, relation_correctness_matrix = score_file_pair(
+        file_pair, overlap=overlap
+    )
+    return build_adjudication_file(
+        file_id=annotated_file.file_id,
+        file_text=annotated_file.file_text,
+        total_files=total_files,
+        reference_annotator=reference_annotator,
+        prediction_annotator=prediction_annotator,
+        entity_correctness_matrices=(entity_correctness_matrix,),
+        relation_correctness_matrices=(relation_correctness_matrix,),
+        filter_agreements=filter_agreements,
+    )
+
+
+# Yields adjudication tasks in file_id order, to be handed to
+# utils.write_label_studio_tasks so nothing corpus sized is held
+# in memory.  total_files defaults to the number of paired files,
+# the prediction IDs are file_id + total_files as in
+# build_adjudication_file.  With worker processes at most
+# buffersize files are in flight at once
+def adjudicate_corpora(
+    reference_corpus: SingleAnnotatorCorpus,
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_annotator: str,
+    prediction_annotator: str,
+    overlap: bool,
+    filter_agreements: bool = True,
+    total_files: int | None = None,
+    max_workers: int | None = 1,
+    buffersize: int = 64,
+) -> Iterator[dict]:
+    id_to_file_pair = pair_files_by_id(predicted_corpus, reference_corpus)
+    local_adjudicate_file_pair = partial(
+        adjudicate_file_pair,
+        total_files=total_files if total_files is not None else len(id_to_file_pair),
+        reference_annotator=reference_annotator,
+        prediction_annotator=prediction_annotator,
+        overlap=overlap,
+        filter_agreements=filter_agreements,
+    )
+    tasks = map_file_pairs(
+        local_adjudicate_file_pair,
+        id_to_file_pair,
+        max_workers,
+        chunksize=1,
+        buffersize=buffersize,
+    )
+    yield from (task for task in tasks if task is not None)
+
+
 def build_preannotations(
     prediction_id: int,
     reference_annotator: str,
@@ -157,6 +228,7 @@ def get_correctness[T](
     return correctness_matrix.get_correctness(t)
 
 
+@timed("adjudication")
 def get_adjudication_data(
     reference_annotator: str,
     prediction_annotator: str,
@@ -187,9 +259,7 @@ def get_adjudication_data(
             filter_agreements,
         )
     )
-    unique_adjudicated_relations = list(
-        unique_everseen(adjudicated_relations, key=deepfreeze)
-    )
+    unique_adjudicated_relations = list(unique_annotations(adjudicated_relations))
     if len(adjudicated_relations) != len(unique_adjudicated_relations):
         raise ValueError(
             f"Of {len(adjudicated_relations)} adjudicated relations {len(unique_adjudicated_relations)} are unique"
@@ -210,6 +280,55 @@ def get_adjudication_data(
     )
 
 
+def get_payload_fingerprint(payload: Any) -> Hashable:
+    # Annotation payloads are lists of strings (labels, choices, text)
+    # anything else just doesn't contribute to the fingerprint
+    if isinstance(payload, list) and all(isinstance(item, str) for item in payload):
+        return tuple(payload)
+    return None
+
+
+# Cheap stand-in for deepfreeze-ing the whole annotation,
+# only the fields which tell annotations apart in practice
+def get_annotation_fingerprint(annotation: dict) -> Hashable:
+    value = annotation.get("value")
+    if isinstance(value, dict):
+        return (
+            annotation.get("id"),
+            annotation.get("from_name"),
+            annotation.get("type"),
+            value.get("start"),
+            value.get("end"),
+            get_payload_fingerprint(value.get(annotation.get("type"))),
+        )
+    return (
+        annotation.get("id"),
+        annotation.get("type"),
+        annotation.get("from_id"),
+        annotation.get("to_id"),
+        annotation.get("direction"),
+        get_payload_fingerprint(annotation.get("labels")),
+    )
+
+
+# Same result as unique_everseen(annotations, key=deepfreeze),
+# annotations sharing a fingerprint fall back to
+# full structural comparison
+def unique_annotations(annotations: Iterable[dict]) -> Iterator[dict]:
+    fingerprint_to_annotations = defaultdict(list)
+    for annotation in annotations:
+        seen_annotations = fingerprint_to_annotations[
+            get_annotation_fingerprint(annotation)
+        ]
+        if any(annotation == seen for seen in seen_annotations):
+            increment("dedup_duplicates")
+            continue
+        if len(seen_annotations) > 0:
+            increment("dedup_fingerprint_collisions")
+        seen_annotations.append(annotation)
+        yield annotation
+
+
 def order_adjudication_data(
     entities: Iterable[dict],
     relations: Iterable[dict],
@@ -246,7 +365,7 @@ def adjudicate_single_id_entity_group[T](
         raise ValueError(f"Wrong number of entities {len(entities)}")
     entity = entities[0]
     source_entities = [
-        json.loads(entity_source) for entity_source in entity.source_annotations
+        entity_source.to_dict() for entity_source in entity.source_annotations
     ]
     label_entities = [
         entity for entity in source_entities if entity["type"] == "labels"
@@ -502,20 +621,20 @@ def adjudicate_offset_entity_cluster[T](
         ) if total_references > 0:
             yield from references
         case _:
+            increment("wrangle_mixed_clusters")
             yield from wrangle_mixed(
                 annotator_to_annotations=annotator_to_annotations,
                 argument_entity_ids=argument_entity_ids,
             )
 
 
+@timed("adjudication_clustering")
 def coordinate_adjudicated_entities(
     adjudicated_entities: Iterable[dict],
     argument_entity_ids: Collection[str],
 ) -> Iterable[dict]:
     sized_adjudicated_entities = list(adjudicated_entities)
-    unique_adjudicated_entities = list(
-        unique_everseen(sized_adjudicated_entities, key=deepfreeze)
-    )
+    unique_adjudicated_entities = list(unique_annotations(sized_adjudicated_entities))
 
     def get_ids(entities: Collection[dict]) -> Set[str]:
         return set(map(itemgetter("id"), entities))
@@ -591,12 +710,10 @@ def adjudicate_correctness_grouped_relations(
                 f"Wrong number of relations from {from_id} to {to_id}: {len(relations)}"
             )
         relation = relations[0]
-        source_relations = [
-            json.loads(relation_source)
-            for relation_source in relation.source_annotations
-        ]
         label_relations = [
-            entity for entity in source_relations if entity["type"] == "relation"
+            relation_source.annotation
+            for relation_source in relation.source_annotations
+            if relation_source.annotation_type == "relation"
         ]
         if len(label_relations) != 1:
             raise ValueError(
@@ -615,14 +732,17 @@ def adjudicate_relations(
     correctness_matrices: Iterable[CorrectnessMatrix[Relation]],
     filter_agreements: bool = True,
 ) -> Iterable[dict]:
+    # Relations are labelled with the annotator names, the same
+    # vocabulary update_schema adds to the Relations tag
     for correctness_matrix in correctness_matrices:
         if not filter_agreements:
             yield from adjudicate_correctness_grouped_relations(
-                AnnotatorChoice.AGREEMENT, correctness_matrix.true_positives
+                annotators(AnnotatorChoice.AGREEMENT),
+                correctness_matrix.true_positives,
             )
         yield from adjudicate_correctness_grouped_relations(
-            AnnotatorChoice.PREDICTION, correctness_matrix.false_positives
+            annotators(AnnotatorChoice.PREDICTION), correctness_matrix.false_positives
         )
         yield from adjudicate_correctness_grouped_relations(
-            AnnotatorChoice.REFERENCE, correctness_matrix.false_negatives
+            annotators(AnnotatorChoice.REFERENCE), correctness_matrix.false_negatives
         )
@@ -0,0 +1,264 @@
+from collections import Counter, defaultdict
+from collections.abc import Mapping, Sequence, Set
+from dataclasses import dataclass
+from functools import partial
+from itertools import combinations
+from operator import attrgetter
+
+import numpy as np
+
+from .correctness_matrix import Correctness, score_totals
+from .datatypes import AnnotatedFile, Relation, SingleAnnotatorCorpus
+from .score import (
+    build_relation_span_indices,
+    map_file_pairs,
+    overlap_relation_alignments,
+    unzip_alignments,
+)
+from .span_index import SpanIndex, build_span_index
+
+
+# Everything matching needs from one annotator's file, built once
+# per annotator per file however many other annotators it's compared to
+@dataclass(frozen=True)
+class AnnotatorFileIndex:
+    span_counts: Mapping[tuple[int, int], int]
+    span_index: SpanIndex[tuple[int, int]]
+    relations: Sequence[Relation]
+    relation_keys: Sequence[tuple]
+    relation_key_set: Set[tuple]
+    relation_span_indices: Mapping[tuple[tuple[str, ...], bool], SpanIndex[int]]
+
+    def total_entities(self) -> int:
+        return sum(self.span_counts.values())
+
+
+def build_annotator_file_index(
+    annotated_file: AnnotatedFile, overlap: bool
+) -> AnnotatorFileIndex:
+    span_counts = Counter(map(attrgetter("span"), annotated_file.entities))
+    relations = tuple(annotated_file.relations)
+    relation_keys = tuple(relation.get_canonical_key() for relation in relations)
+    return AnnotatorFileIndex(
+        span_counts=span_counts,
+        span_index=build_span_index((span, span) for span in span_counts.keys())
+        if overlap
+        else SpanIndex(),
+        relations=relations,
+        relation_keys=relation_keys,
+        relation_key_set=frozenset(relation_keys),
+        relation_span_indices=build_relation_span_indices(relations) if overlap else {},
+    )
+
+
+# Same tallies as score.count_entity_correctness and
+# score.count_relation_correctness from prebuilt indices
+def count_indexed_entities(
+    predicted_index: AnnotatorFileIndex,
+    reference_index: AnnotatorFileIndex,
+    overlap: bool,
+) -> Counter[Correctness]:
+    if overlap:
+        true_positives = sum(
+            count
+            for span, count in predicted_index.span_counts.items()
+            if reference_index.span_index.overlaps_any(span)
+        )
+        false_negatives = sum(
+            count
+            for span, count in reference_index.span_counts.items()
+            if not predicted_index.span_index.overlaps_any(span)
+        )
+    else:
+        true_positives = sum(
+            count
+            for span, count in predicted_index.span_counts.items()
+            if span in reference_index.span_counts
+        )
+        false_negatives = sum(
+            count
+            for span, count in reference_index.span_counts.items()
+            if span not in predicted_index.span_counts
+        )
+    return Counter(
+        {
+            Correctness.TRUE_POSITIVE: true_positives,
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: predicted_index.total_entities()
+            - true_positives,
+            Correctness.FALSE_NEGATIVE: false_negatives,
+        }
+    )
+
+
+def count_indexed_relations(
+    predicted_index: AnnotatorFileIndex,
+    reference_index: AnnotatorFileIndex,
+    overlap: bool,
+) -> Counter[Correctness]:
+    if overlap:
+        matched_prediction_indices, matched_reference_indices = map(
+            set,
+            unzip_alignments(
+                overlap_relation_alignments(
+                    predicted_index.relations,
+                    reference_index.relations,
+                    reference_span_indices=reference_index.relation_span_indices,
+                )
+            ),
+        )
+        true_positives = len(matched_prediction_indices)
+        false_negatives = len(reference_index.relations) - len(
+            matched_reference_indices
+        )
+    else:
+        true_positives = sum(
+            1
+            for key in predicted_index.relation_keys
+            if key in reference_index.relation_key_set
+        )
+        false_negatives = sum(
+            1
+            for key in reference_index.relation_keys
+            if key not in predicted_index.relation_key_set
+        )
+    return Counter(
+        {
+            Correctness.TRUE_POSITIVE: true_positives,
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: len(predicted_index.relations) - true_positives,
+            Correctness.FALSE_NEGATIVE: false_negatives,
+        }
+    )
+
+
+# Tallies for the other direction of a pair, matching is symmetric
+# so the reference's true positives are the ones it didn't miss
+def swap_roles(
+    correctness_totals: Mapping[Correctness, int], reference_total: int
+) -> Counter[Correctness]:
+    return Counter(
+        {
+            Correctness.TRUE_POSITIVE: reference_total
+            - correctness_totals[Correctness.FALSE_NEGATIVE],
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: correctness_totals[Correctness.FALSE_NEGATIVE],
+            Correctness.FALSE_NEGATIVE: correctness_totals[Correctness.FALSE_POSITIVE],
+        }
+    )
+
+
+# Tallies for every ordered pair of annotators with the file,
+# keyed by positions in annotator_files, the first predicted
+def count_file_agreement(
+    annotator_files: Sequence[AnnotatedFile | None], overlap: bool
+) -> Mapping[tuple[int, int], tuple[Counter[Correctness], Counter[Correctness]]]:
+    position_to_index = {
+        position: build_annotator_file_index(annotated_file, overlap)
+        for position, annotated_file in enumerate(annotator_files)
+        if annotated_file is not None
+    }
+    pair_to_counts = {}
+    for first, second in combinations(position_to_index.keys(), r=2):
+        first_index = position_to_index[first]
+        second_index = position_to_index[second]
+        entity_counts = count_indexed_entities(first_index, second_index, overlap)
+        relation_counts = count_indexed_relations(first_index, second_index, overlap)
+        pair_to_counts[first, second] = (entity_counts, relation_counts)
+        pair_to_counts[second, first] = (
+            swap_roles(entity_counts, second_index.total_entities()),
+            swap_roles(relation_counts, len(second_index.relations)),
+        )
+    return pair_to_counts
+
+
+# Tallies for every ordered pair of annotators over the files both
+# annotated, (a, b) treating a as the prediction and b as the reference.
+# F1 doesn't depend on which is which so the matrices are symmetric
+@dataclass(frozen=True)
+class PairwiseAgreement[T]:
+    annotators: Sequence[T]
+    entity_totals: Mapping[tuple[T, T], Counter[Correctness]]
+    relation_totals: Mapping[tuple[T, T], Counter[Correctness]]
+    shared_files: Mapping[tuple[T, T], int]
+
+    def get_f1_matrix(self, relations: bool = False) -> np.ndarray:
+        pair_totals = self.relation_totals if relations else self.entity_totals
+        f1_matrix = np.full((len(self.annotators), len(self.annotators)), np.nan)
+        for row, first in enumerate(self.annotators):
+            for column, second in enumerate(self.annotators):
+                if row == column:
+                    f1_matrix[row, column] = 1.0
+                elif (first, second) in pair_totals:
+                    f1_matrix[row, column] = score_totals(pair_totals[first, second])[0]
+        return f1_matrix
+
+    # Mentions from both annotators over the files they share
+    def get_support_matrix(self, relations: bool = False) -> np.ndarray:
+        pair_totals = self.relation_totals if relations else self.entity_totals
+        support_matrix = np.zeros(
+            (len(self.annotators), len(self.annotators)), dtype=np.int64
+        )
+        for row, first in enumerate(self.annotators):
+            for column, second in enumerate(self.annotators):
+                if row == column or (first, second) not in pair_totals:
+                    continue
+                support_matrix[row, column] = sum(
+                    pair_totals[pair][correctness]
+                    for pair in ((first, second), (second, first))
+                    for correctness in (
+                        Correctness.TRUE_POSITIVE,
+                        Correctness.FALSE_POSITIVE,
+                    )
+                )
+        return support_matrix
+
+    def get_shared_files_matrix(self) -> np.ndarray:
+        return np.array(
+            [
+                [
+                    self.shared_files.get((first, second), 0)
+                    for second in self.annotators
+                ]
+                for first in self.annotators
+            ],
+            dtype=np.int64,
+        )
+
+
+# Unlike score.count_corpora files only one of a pair
+# annotated are left out, agreement is over what both saw
+def pairwise_agreement[T](
+    annotator_to_corpus: Mapping[T, SingleAnnotatorCorpus],
+    overlap: bool,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> PairwiseAgreement[T]:
+    annotators = tuple(annotator_to_corpus.keys())
+    file_id_to_files = defaultdict(lambda: [None] * len(annotators))
+    for position, annotator in enumerate(annotators):
+        for annotated_file in annotator_to_corpus[annotator].annotated_files:
+            file_id_to_files[annotated_file.file_id][position] = annotated_file
+    id_to_annotator_files = {
+        file_id: file_id_to_files[file_id] for file_id in sorted(file_id_to_files)
+    }
+    entity_totals = defaultdict(Counter)
+    relation_totals = defaultdict(Counter)
+    shared_files = Counter()
+    for pair_to_counts in map_file_pairs(
+        partial(count_file_agreement, overlap=overlap),
+        id_to_annotator_files,
+        max_workers,
+        chunksize,
+    ):
+        for (first, second), (entity_counts, relation_counts) in pair_to_counts.items():
+            pair = (annotators[first], annotators[second])
+            entity_totals[pair].update(entity_counts)
+            relation_totals[pair].update(relation_counts)
+            shared_files[pair] += 1
+    return PairwiseAgreement(
+        annotators=annotators,
+        entity_totals=dict(entity_totals),
+        relation_totals=dict(relation_totals),
+        shared_files=dict(shared_files),
+    )
@@ -0,0 +1,177 @@
+from collections import Counter, defaultdict
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from functools import partial
+
+from .correctness_matrix import Correctness, CorrectnessMatrix, score_totals
+from .datatypes import (
+    AnnotatedFile,
+    DocTimeRel,
+    Entity,
+    SingleAnnotatorCorpus,
+    overlap_length,
+)
+from .score import (
+    alignments_to_correctness_matrix,
+    entity_alignments,
+    map_file_pairs,
+    pair_files_by_id,
+)
+
+
+# Agreement on entity attributes over aligned (predicted, reference)
+# entity pairs.  dtr_confusion is keyed (predicted, reference),
+# cui_totals treats each pair's CUIs as a predicted and reference set
+@dataclass
+class AttributeTotals:
+    dtr_confusion: Counter[tuple[DocTimeRel | None, DocTimeRel | None]] = field(
+        default_factory=Counter
+    )
+    cui_totals: Counter[Correctness] = field(default_factory=Counter)
+    cui_jaccard_total: float = 0.0
+    cui_pairs: int = 0
+    aligned_pairs: int = 0
+
+    def update(self, other: AttributeTotals) -> None:
+        self.dtr_confusion.update(other.dtr_confusion)
+        self.cui_totals.update(other.cui_totals)
+        self.cui_jaccard_total += other.cui_jaccard_total
+        self.cui_pairs += other.cui_pairs
+        self.aligned_pairs += other.aligned_pairs
+
+    # Over pairs where the reference has a DocTimeRel,
+    # a prediction without one counts as wrong
+    def get_dtr_accuracy(self) -> float:
+        scored_pairs = 0
+        correct_pairs = 0
+        for (predicted_dtr, reference_dtr), count in self.dtr_confusion.items():
+            if reference_dtr is None:
+                continue
+            scored_pairs += count
+            if predicted_dtr == reference_dtr:
+                correct_pairs += count
+        if scored_pairs == 0:
+            return float("nan")
+        return correct_pairs / scored_pairs
+
+    # Micro averaged over pairs, (f1, precision, recall, support)
+    def get_cui_scores(self) -> tuple[float, float, float, int]:
+        return score_totals(self.cui_totals)
+
+    # Mean over pairs where either side has a CUI
+    def get_cui_jaccard(self) -> float:
+        if self.cui_pairs == 0:
+            return float("nan")
+        return self.cui_jaccard_total / self.cui_pairs
+
+
+# Each predicted entity's attributes are compared against one
+# reference entity, of those aligned with it the one it overlaps
+# most, preferring the same label and then the earliest
+def best_reference_entities(
+    alignments: Iterable[tuple[Entity, Entity]],
+) -> Mapping[Entity, Entity]:
+    predicted_to_references = defaultdict(list)
+    for predicted_entity, reference_entity in alignments:
+        predicted_to_references[predicted_entity].append(reference_entity)
+    return {
+        predicted_entity: min(
+            reference_entities,
+            key=lambda reference_entity: (
+                -overlap_length(predicted_entity.span, reference_entity.span),
+                reference_entity.label != predicted_entity.label,
+                reference_entity.span,
+                reference_entity.label_studio_id,
+            ),
+        )
+        for predicted_entity, reference_entities in predicted_to_references.items()
+    }
+
+
+def count_attribute_agreement(
+    entity_pairs: Iterable[tuple[Entity, Entity]],
+) -> AttributeTotals:
+    attribute_totals = AttributeTotals()
+    for predicted_entity, reference_entity in entity_pairs:
+        attribute_totals.aligned_pairs += 1
+        attribute_totals.dtr_confusion[predicted_entity.dtr, reference_entity.dtr] += 1
+        predicted_cuis = set(predicted_entity.cuis)
+        reference_cuis = set(reference_entity.cuis)
+        shared_cuis = len(predicted_cuis & reference_cuis)
+        attribute_totals.cui_totals[Correctness.TRUE_POSITIVE] += shared_cuis
+        attribute_totals.cui_totals[Correctness.FALSE_POSITIVE] += (
+            len(predicted_cuis) - shared_cuis
+        )
+        attribute_totals.cui_totals[Correctness.FALSE_NEGATIVE] += (
+            len(reference_cuis) - shared_cuis
+        )
+        all_cuis = len(predicted_cuis | reference_cuis)
+        if all_cuis > 0:
+            attribute_totals.cui_jaccard_total += shared_cuis / all_cuis
+            attribute_totals.cui_pairs += 1
+    return attribute_totals
+
+
+# Span correctness and attribute agreement from the one matching pass
+def score_entity_attributes(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    overlap: bool,
+) -> tuple[CorrectnessMatrix[Entity], AttributeTotals]:
+    alignments = list(
+        entity_alignments(predicted_entities, reference_entities, overlap)
+    )
+    return (
+        alignments_to_correctness_matrix(
+            predicted_entities, reference_entities, alignments
+        ),
+        count_attribute_agreement(best_reference_entities(alignments).items()),
+    )
+
+
+def count_file_pair_attributes(
+    file_pair: tuple[AnnotatedFile | None, AnnotatedFile | None],
+    overlap: bool,
+) -> tuple[Counter[Correctness], AttributeTotals]:
+    predicted_file, reference_file = file_pair
+    correctness_matrix, attribute_totals = score_entity_attributes(
+        predicted_file.entities if predicted_file is not None else frozenset(),
+        reference_file.entities if reference_file is not None else frozenset(),
+        overlap=overlap,
+    )
+    return Counter(correctness_matrix.to_correctness_totals()), attribute_totals
+
+
+def count_corpora_attributes(
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_corpus: SingleAnnotatorCorpus,
+    overlap: bool,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> tuple[Counter[Correctness], AttributeTotals]:
+    entity_totals = Counter()
+    attribute_totals = AttributeTotals()
+    for entity_counts, file_attribute_totals in map_file_pairs(
+        partial(count_file_pair_attributes, overlap=overlap),
+        pair_files_by_id(predicted_corpus, reference_corpus),
+        max_workers,
+        chunksize,
+    ):
+        entity_totals.update(entity_counts)
+        attribute_totals.update(file_attribute_totals)
+    return entity_totals, attribute_totals
+
+
+# Rows predicted, columns reference, in DocTimeRel
+# order with None (no DocTimeRel given) last
+def dtr_confusion_table(
+    attribute_totals: AttributeTotals,
+) -> tuple[Sequence[DocTimeRel | None], Sequence[Sequence[int]]]:
+    dtrs = (*DocTimeRel, None)
+    return dtrs, [
+        [
+            attribute_totals.dtr_confusion[predicted_dtr, reference_dtr]
+            for reference_dtr in dtrs
+        ]
+        for predicted_dtr in dtrs
+    ]
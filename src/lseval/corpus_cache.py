@@ -0,0 +1,176 @@
+import gc
+import hashlib
+import logging
+import os
+import pickle
+from collections.abc import Collection, Mapping, Sequence
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+
+from .datatypes import SingleAnnotatorCorpus
+from .schema import DEFAULT_SCHEMA, CompiledSchema
+from .utils import (
+    PARSER_VERSION,
+    get_annotator_ids_to_skip,
+    organize_corpus_annotations_by_annotator,
+    read_label_studio_export,
+)
+
+logger = logging.getLogger(__name__)
+
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(name)s -   %(message)s",
+    datefmt="%m/%d/%Y %H:%M:%S",
+    level=logging.INFO,
+)
+
+CACHE_SUFFIX = ".corpus.pickle"
+
+
+def hash_export(export_path: str | PathLike, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(export_path, "rb") as export_file:
+        while chunk := export_file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Parsed corpora keyed by export content, parser version and the
+# annotator arguments, stored as pickles in cache_directory.
+# Least recently loaded entries are evicted once the directory
+# goes over max_bytes
+@dataclass(frozen=True)
+class ParsedCorpusCache:
+    cache_directory: Path
+    max_bytes: int = 1 << 31
+
+    def get_key[T](
+        self,
+        export_path: str | PathLike,
+        id_to_unique_annotator: Mapping[int, T],
+        annotator_ids_to_ignore: Sequence[int],
+        schema: CompiledSchema = DEFAULT_SCHEMA,
+        annotators_to_keep: Collection[T] | None = None,
+    ) -> str:
+        digest = hashlib.sha256()
+        for part in (
+            hash_export(export_path),
+            str(PARSER_VERSION),
+            schema.get_fingerprint(),
+            repr(sorted(id_to_unique_annotator.items())),
+            # Covers both the ignored IDs and annotators_to_keep
+            repr(
+                sorted(
+                    get_annotator_ids_to_skip(
+                        id_to_unique_annotator,
+                        annotator_ids_to_ignore,
+                        annotators_to_keep,
+                    )
+                )
+            ),
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return self.cache_directory / f"{key}{CACHE_SUFFIX}"
+
+    def load[T](self, key: str) -> Mapping[T, SingleAnnotatorCorpus] | None:
+        cache_path = self.get_path(key)
+        # Unpickling allocates nothing but new container objects,
+        # letting the cyclic GC keep rescanning them more than
+        # doubles the load time and none of it is garbage
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(cache_path, "rb") as cache_file:
+                annotator_to_corpus = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        # A pickle from before a class or module changed can fail in
+        # any of these (ImportError covers ModuleNotFoundError),
+        # all of them just mean parsing again
+        except (
+            OSError,
+            pickle.UnpicklingError,
+            EOFError,
+            AttributeError,
+            ImportError,
+            TypeError,
+            ValueError,
+        ):
+            logger.warning("Dropping unreadable parsed corpus cache %s", cache_path)
+            self.invalidate(key)
+            return None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        # Loading counts as use for eviction
+        os.utime(cache_path)
+        return annotator_to_corpus
+
+    def store[T](
+        self, key: str, annotator_to_corpus: Mapping[T, SingleAnnotatorCorpus]
+    ) -> None:
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        cache_path = self.get_path(key)
+        temporary_path = cache_path.with_suffix(".tmp")
+        with open(temporary_path, "wb") as cache_file:
+            pickle.dump(
+                dict(annotator_to_corpus),
+                cache_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temporary_path, cache_path)
+        self.evict()
+
+    def invalidate(self, key: str) -> None:
+        self.get_path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for cache_path in self.cache_directory.glob(f"*{CACHE_SUFFIX}"):
+            cache_path.unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        cache_paths = sorted(
+            self.cache_directory.glob(f"*{CACHE_SUFFIX}"),
+            key=lambda cache_path: cache_path.stat().st_mtime,
+        )
+        total_bytes = sum(cache_path.stat().st_size for cache_path in cache_paths)
+        # Oldest first, but always keep the newest even if it's over budget
+        for cache_path in cache_paths[:-1]:
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= cache_path.stat().st_size
+            cache_path.unlink(missing_ok=True)
+
+
+def load_or_parse_export[T](
+    export_path: str | PathLike,
+    id_to_unique_annotator: Mapping[int, T],
+    annotator_ids_to_ignore: Sequence[int],
+    cache: ParsedCorpusCache,
+    schema: CompiledSchema = DEFAULT_SCHEMA,
+    annotators_to_keep: Collection[T] | None = None,
+) -> Mapping[T, SingleAnnotatorCorpus]:
+    key = cache.get_key(
+        export_path,
+        id_to_unique_annotator,
+        annotator_ids_to_ignore,
+        schema,
+        annotators_to_keep,
+    )
+    annotator_to_corpus = cache.load(key)
+    if annotator_to_corpus is not None:
+        return annotator_to_corpus
+    annotator_to_corpus = organize_corpus_annotations_by_annotator(
+        read_label_studio_export(export_path),
+        id_to_unique_annotator,
+        annotator_ids_to_ignore,
+        schema,
+        annotators_to_keep,
+    )
+    cache.store(key, annotator_to_corpus)
+    return annotator_to_corpus
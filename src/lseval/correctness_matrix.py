@@ -1,4 +1,4 @@
-from collections.abc import Collection, Iterator, Mapping, Set
+from collections.abc import Collection, Iterable, Iterator, Mapping, Set
 from dataclasses import dataclass, field
 from enum import IntEnum
 from functools import cache
@@ -169,3 +169,17 @@ class CorrectnessMatrix[T](Collection[T]):
         yield from self.true_negatives
         yield from self.false_positives
         yield from self.false_negatives
+
+
+# Only meaningful when the matrices are over disjoint data,
+# e.g. per-file matrices since entities and relations carry their file_id
+def merge_correctness_matrices[T](
+    correctness_matrices: Iterable[CorrectnessMatrix[T]],
+) -> CorrectnessMatrix[T]:
+    merged = CorrectnessMatrix()
+    for correctness_matrix in correctness_matrices:
+        merged.true_positives |= correctness_matrix.true_positives
+        merged.true_negatives |= correctness_matrix.true_negatives
+        merged.false_positives |= correctness_matrix.false_positives
+        merged.false_negatives |= correctness_matrix.false_negatives
+    return merged
@@ -1,9 +1,10 @@
 from collections import Counter
-from collections.abc import Iterable
-from dataclasses import dataclass, field
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field, fields
 from enum import Enum
 from itertools import combinations, product
 from operator import itemgetter
+from sys import intern
 from typing import Any
 
 
@@ -19,7 +20,48 @@ class DocTimeRel(Enum):
         return DocTimeRel.NA
 
 
+# Parsed, read-only view of a single raw Label Studio annotation,
+# replaces keeping json.dumps strings around and json.loads-ing
+# them again for adjudication.  Hashing only uses the identifying
+# fields, the full annotation is still used for equality.
+# annotation is a private copy and should be treated as read-only,
+# use to_dict for something mutable
 @dataclass(eq=True, frozen=True)
+class SourceAnnotation:
+    annotation_id: str | None
+    from_name: str | None
+    annotation_type: str | None
+    annotation: Mapping[str, Any] = field(hash=False, repr=False)
+
+    @classmethod
+    def from_dict(cls, annotation: Mapping[str, Any]) -> SourceAnnotation:
+        return cls(
+            annotation_id=annotation.get("id"),
+            from_name=annotation.get("from_name"),
+            annotation_type=annotation.get("type"),
+            annotation=copy_annotation(annotation),
+        )
+
+    def to_dict(self) -> dict:
+        return copy_annotation(self.annotation)
+
+
+# Everything downstream only ever (re)assigns top level keys
+# and keys of "value", so that's all that needs copying
+def copy_annotation(annotation: Mapping[str, Any]) -> dict:
+    copied = dict(annotation)
+    value = copied.get("value")
+    if isinstance(value, Mapping):
+        copied["value"] = dict(value)
+    return copied
+
+
+# Slotted since these are by far the most numerous objects.
+# Hashing only uses the identifying fields, equality still
+# compares everything, which keeps hashing cheap without
+# caching the hash in every instance (for 1M+ entities the
+# cached int costs more than it saves)
+@dataclass(eq=True, frozen=True, slots=True)
 class Entity:
     file_id: int
     label_studio_id: str
@@ -28,11 +70,31 @@ class Entity:
     dtr: DocTimeRel | None = field(compare=False)
     label: str | None = field(compare=False)
     cuis: tuple[str, ...]
-    source_annotations: tuple[str, ...]
+    source_annotations: tuple[SourceAnnotation, ...]
 
     def __post_init__(self):
         if self.span[1] <= self.span[0]:
             raise ValueError(f"Invalid span {self.span}")
+        self.intern_strings()
+
+    # Only a handful of labels, each otherwise
+    # its own string per parsed annotation
+    def intern_strings(self) -> None:
+        if self.label is not None:
+            object.__setattr__(self, "label", intern(self.label))
+
+    # Unpickling (corpus_cache, worker processes) skips __post_init__
+    # and would give every entity its own copy of the label again
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, entity_field.name) for entity_field in fields(self))
+
+    def __setstate__(self, state: tuple) -> None:
+        for entity_field, value in zip(fields(self), state, strict=True):
+            object.__setattr__(self, entity_field.name, value)
+        self.intern_strings()
+
+    def __hash__(self) -> int:
+        return hash((self.file_id, self.label_studio_id, self.span))
 
     def span_match(self, other: Any, overlap: bool = False) -> bool:
         if not isinstance(other, Entity):
@@ -47,41 +109,66 @@ class Entity:
         return self.span[0] < other.span[1] and self.span[1] > other.span[0]
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=True, frozen=True, slots=True)
 class Relation:
     file_id: int
     arg1: Entity
     arg2: Entity
     label: tuple[str, ...]
-    source_annotations: tuple[str]
+    source_annotations: tuple[SourceAnnotation]
     directed: bool = False
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    # Relations are far fewer than entities and the canonical key
+    # isn't free to build, so here the hash is cached.  Not pickled
+    # since string hashes differ between processes
+    def __post_init__(self):
+        object.__setattr__(self, "label", tuple(map(intern, self.label)))
+        object.__setattr__(self, "_hash", hash(self.get_canonical_key()))
 
     # FIXME - not sure how Anaforatools
     # handles this but here currently the
     # Relation equality is agnostic to the types
     # of its arguments, part of the motiviation
     # for this is conceptual difficulty of scoring
-    # if it's not type agnostic
+    # if it's not type agnostic.
+    # Equality and hashing both go through the canonical key
+    # so they agree for undirected relations with swapped arguments
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Relation):
             return False
-        if self.directed and other.directed:
-            return (other.file_id, other.arg1.span, other.arg2.span, other.label) == (
+        return self._hash == other._hash and (
+            self.get_canonical_key() == other.get_canonical_key()
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self) -> tuple:
+        return Relation, (
+            self.file_id,
+            self.arg1,
+            self.arg2,
+            self.label,
+            self.source_annotations,
+            self.directed,
+        )
+
+    # Undirected relations ignore argument order
+    def get_canonical_key(
+        self,
+    ) -> tuple[int, tuple[str, ...], bool, tuple[tuple[int, int], tuple[int, int]]]:
+        if self.directed or self.arg1.span <= self.arg2.span:
+            return (
                 self.file_id,
-                self.arg1.span,
-                self.arg2.span,
                 self.label,
+                self.directed,
+                (
+                    self.arg1.span,
+                    self.arg2.span,
+                ),
             )
-        if not self.directed and not other.directed:
-            order_ignored_match = {self.arg1.span, self.arg2.span} == {
-                other.arg1.span,
-                other.arg2.span,
-            }
-            return (other.file_id, other.label) == (
-                self.file_id,
-                self.label,
-            ) and order_ignored_match
-        return False
+        return self.file_id, self.label, self.directed, (self.arg2.span, self.arg1.span)
 
     def overlap_match(self, other: Any) -> bool:
         if not isinstance(other, Relation):
@@ -93,6 +180,11 @@ class Relation:
 
             return other.label == self.label and order_sensitive_match
         if not self.directed and not other.directed:
+            if self.arg1.span != self.arg2.span and other.arg1.span != other.arg2.span:
+                order_ignored_match = paired_overlap_exists(
+                    self.arg1.span, self.arg2.span, other.arg1.span, other.arg2.span
+                )
+                return other.label == self.label and order_ignored_match
             this_spans = {self.arg1.span, self.arg2.span}
             other_spans = {other.arg1.span, other.arg2.span}
             order_ignored_match = overlap_exists(this_spans, other_spans)
@@ -104,6 +196,11 @@ def overlap_match(arg1_span: tuple[int, int], arg2_span: tuple[int, int]) -> boo
     return arg1_span[0] < arg2_span[1] and arg1_span[1] > arg2_span[0]
 
 
+# Characters the spans share, 0 or less when they don't overlap
+def overlap_length(first_span: tuple[int, int], second_span: tuple[int, int]) -> int:
+    return min(first_span[1], second_span[1]) - max(first_span[0], second_span[0])
+
+
 def admits_bijection[T](preimage: Iterable[T], image: Iterable[T]) -> bool:
     # reduced function is a permutation but allows for repeats
     return sorted(Counter(preimage).values()) == sorted(Counter(image).values())
@@ -121,6 +218,24 @@ def get_image[T](mapping: Iterable[tuple[T, T]]) -> Iterable[T]:
     return get_nth(mapping, n=1)
 
 
+# Closed form of overlap_exists for two sets of two distinct spans,
+# where there are only two bijections to check,
+# avoids building the combinations and Counters per call
+def paired_overlap_exists(
+    first_span_1: tuple[int, int],
+    first_span_2: tuple[int, int],
+    second_span_1: tuple[int, int],
+    second_span_2: tuple[int, int],
+) -> bool:
+    return (
+        overlap_match(first_span_1, second_span_1)
+        and overlap_match(first_span_2, second_span_2)
+    ) or (
+        overlap_match(first_span_1, second_span_2)
+        and overlap_match(first_span_2, second_span_1)
+    )
+
+
 def overlap_exists(
     first_spans: Iterable[tuple[int, int]], second_spans: Iterable[tuple[int, int]]
 ) -> bool:
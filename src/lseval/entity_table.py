@@ -0,0 +1,132 @@
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .correctness_matrix import Correctness, CorrectnessMatrix
+from .datatypes import Entity, SingleAnnotatorCorpus
+
+
+# Columnar view of every entity in a corpus, row i of each array
+# describes entities[i].  Built once per corpus so exact matching
+# over the whole corpus is a handful of array operations
+# instead of a Python loop per file
+@dataclass(frozen=True)
+class EntityTable:
+    file_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    starts: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    ends: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    label_codes: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    labels: Sequence[str | None] = field(default_factory=tuple)
+    entities: Sequence[Entity] = field(default_factory=tuple)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def get_keys(self) -> np.ndarray:
+        return np.stack((self.file_ids, self.starts, self.ends), axis=1)
+
+
+def build_entity_table(entities: Iterable[Entity]) -> EntityTable:
+    # Sorting isn't needed for the join, it's just
+    # so the same entities always give the same table
+    sorted_entities = tuple(
+        sorted(
+            entities,
+            key=lambda entity: (entity.file_id, entity.span, entity.label_studio_id),
+        )
+    )
+    label_to_code = {}
+    for entity in sorted_entities:
+        label_to_code.setdefault(entity.label, len(label_to_code))
+    return EntityTable(
+        file_ids=np.fromiter(
+            (entity.file_id for entity in sorted_entities),
+            dtype=np.int64,
+            count=len(sorted_entities),
+        ),
+        starts=np.fromiter(
+            (entity.span[0] for entity in sorted_entities),
+            dtype=np.int64,
+            count=len(sorted_entities),
+        ),
+        ends=np.fromiter(
+            (entity.span[1] for entity in sorted_entities),
+            dtype=np.int64,
+            count=len(sorted_entities),
+        ),
+        label_codes=np.fromiter(
+            (label_to_code[entity.label] for entity in sorted_entities),
+            dtype=np.int32,
+            count=len(sorted_entities),
+        ),
+        labels=tuple(label_to_code.keys()),
+        entities=sorted_entities,
+    )
+
+
+def build_corpus_entity_table(corpus: SingleAnnotatorCorpus) -> EntityTable:
+    return build_entity_table(
+        entity
+        for annotated_file in corpus.annotated_files
+        for entity in annotated_file.entities
+    )
+
+
+# Returns the boolean masks (true positive rows of predicted,
+# false negative rows of reference), every predicted row
+# not a true positive being a false positive
+def exact_entity_table_masks(
+    predicted_table: EntityTable, reference_table: EntityTable
+) -> tuple[np.ndarray, np.ndarray]:
+    # Sort based join, np.unique assigns every distinct
+    # (file_id, start, end) across both tables an integer id
+    # so matching reduces to membership over those ids
+    _, key_ids = np.unique(
+        np.concatenate((predicted_table.get_keys(), reference_table.get_keys())),
+        axis=0,
+        return_inverse=True,
+    )
+    key_ids = key_ids.reshape(-1)
+    predicted_key_ids = key_ids[: len(predicted_table)]
+    reference_key_ids = key_ids[len(predicted_table) :]
+    true_positive_mask = np.isin(predicted_key_ids, reference_key_ids)
+    false_negative_mask = ~np.isin(reference_key_ids, predicted_key_ids)
+    return true_positive_mask, false_negative_mask
+
+
+def exact_entity_table_correctness_matrix(
+    predicted_table: EntityTable, reference_table: EntityTable
+) -> CorrectnessMatrix[Entity]:
+    true_positive_mask, false_negative_mask = exact_entity_table_masks(
+        predicted_table, reference_table
+    )
+    return CorrectnessMatrix(
+        true_positives={
+            predicted_table.entities[row] for row in np.flatnonzero(true_positive_mask)
+        },
+        false_positives={
+            predicted_table.entities[row] for row in np.flatnonzero(~true_positive_mask)
+        },
+        false_negatives={
+            reference_table.entities[row] for row in np.flatnonzero(false_negative_mask)
+        },
+    )
+
+
+def count_exact_entity_table_correctness(
+    predicted_table: EntityTable, reference_table: EntityTable
+) -> Counter[Correctness]:
+    true_positive_mask, false_negative_mask = exact_entity_table_masks(
+        predicted_table, reference_table
+    )
+    true_positives = int(np.count_nonzero(true_positive_mask))
+    return Counter(
+        {
+            Correctness.TRUE_POSITIVE: true_positives,
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: len(predicted_table) - true_positives,
+            Correctness.FALSE_NEGATIVE: int(np.count_nonzero(false_negative_mask)),
+        }
+    )
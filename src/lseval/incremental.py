@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from os import PathLike
+
+from .correctness_matrix import Correctness
+from .schema import DEFAULT_SCHEMA, CompiledSchema
+from .score import count_file_pair
+from .utils import (
+    PARSER_VERSION,
+    get_annotator_ids_to_skip,
+    organize_file_annotations_by_annotator,
+    organize_file_by_annotator_id,
+)
+
+logger = logging.getLogger(__name__)
+
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(name)s -   %(message)s",
+    datefmt="%m/%d/%Y %H:%M:%S",
+    level=logging.INFO,
+)
+
+# Bump whenever scoring changes in a way
+# which would change the cached tallies
+INCREMENTAL_CACHE_VERSION = 1
+
+CORRECTNESS_ORDER = (
+    Correctness.TRUE_POSITIVE,
+    Correctness.TRUE_NEGATIVE,
+    Correctness.FALSE_POSITIVE,
+    Correctness.FALSE_NEGATIVE,
+)
+
+
+@dataclass
+class IncrementalScores:
+    entity_totals: Counter[Correctness] = field(default_factory=Counter)
+    relation_totals: Counter[Correctness] = field(default_factory=Counter)
+    rescored_file_ids: list[int] = field(default_factory=list)
+    reused_file_ids: list[int] = field(default_factory=list)
+
+
+def hash_annotator_results(annotation_sets: Iterable[dict]) -> str:
+    digest = hashlib.sha256()
+    for annotations in annotation_sets:
+        digest.update(
+            json.dumps(
+                annotations["result"], sort_keys=True, separators=(",", ":")
+            ).encode()
+        )
+    return digest.hexdigest()
+
+
+# Per task hash of everything the file's tallies depend on,
+# the text, each compared annotator's annotations and the settings
+def task_annotation_hash[T](
+    raw_file_dictionary: dict,
+    id_to_unique_annotator: Mapping[int, T],
+    annotator_ids_to_ignore: Sequence[int],
+    prediction_annotator: T,
+    reference_annotator: T,
+    overlap: bool,
+    schema: CompiledSchema = DEFAULT_SCHEMA,
+) -> str:
+    def annotator_sets(annotator: T) -> list[dict]:
+        return [
+            annotations
+            for annotations in raw_file_dictionary["annotations"]
+            if annotations["completed_by"] not in annotator_ids_to_ignore
+            and id_to_unique_annotator.get(annotations["completed_by"]) == annotator
+        ]
+
+    digest = hashlib.sha256()
+    for part in (
+        str(INCREMENTAL_CACHE_VERSION),
+        str(PARSER_VERSION),
+        schema.get_fingerprint(),
+        str(overlap),
+        str(prediction_annotator),
+        str(reference_annotator),
+        raw_file_dictionary["data"]["text"],
+        hash_annotator_results(annotator_sets(prediction_annotator)),
+        hash_annotator_results(annotator_sets(reference_annotator)),
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def read_incremental_cache(cache_path: str | PathLike) -> Mapping[str, dict]:
+    try:
+        with open(cache_path, encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.warning("Unreadable incremental cache %s, rescoring", cache_path)
+        return {}
+    if cache.get("version") != INCREMENTAL_CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def write_incremental_cache(
+    cache_path: str | PathLike, file_records: Mapping[str, dict]
+) -> None:
+    # Write then rename so an interrupted run can't leave a partial cache
+    temporary_path = f"{os.fspath(cache_path)}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as cache_file:
+        json.dump(
+            {"version": INCREMENTAL_CACHE_VERSION, "files": file_records}, cache_file
+        )
+    os.replace(temporary_path, cache_path)
+
+
+def totals_to_list(correctness_totals: Mapping[Correctness, int]) -> list[int]:
+    return [correctness_totals.get(correctness, 0) for correctness in CORRECTNESS_ORDER]
+
+
+def list_to_totals(totals: Sequence[int]) -> Counter[Correctness]:
+    return Counter(dict(zip(CORRECTNESS_ORDER, totals, strict=True)))
+
+
+# Scores the prediction annotator against the reference annotator
+# over an export, only reparsing and rescoring the tasks whose
+# hash changed since the cached run.  Cached records for tasks no
+# longer in the export are dropped, so the totals always cover
+# exactly the current export
+def incremental_score_export[T](
+    raw_json_corpus: Iterable[dict],
+    id_to_unique_annotator: Mapping[int, T],
+    annotator_ids_to_ignore: Sequence[int],
+    prediction_annotator: T,
+    reference_annotator: T,
+    overlap: bool,
+    cache_path: str | PathLike,
+    schema: CompiledSchema = DEFAULT_SCHEMA,
+) -> IncrementalScores:
+    cached_records = read_incremental_cache(cache_path)
+    # Only the compared pair is ever parsed
+    annotator_ids_to_skip = get_annotator_ids_to_skip(
+        id_to_unique_annotator,
+        annotator_ids_to_ignore,
+        (prediction_annotator, reference_annotator),
+    )
+    file_records = {}
+    scores = IncrementalScores()
+    for raw_file_dictionary in raw_json_corpus:
+        file_id = int(raw_file_dictionary["id"])
+        task_hash = task_annotation_hash(
+            raw_file_dictionary,
+            id_to_unique_annotator=id_to_unique_annotator,
+            annotator_ids_to_ignore=annotator_ids_to_ignore,
+            prediction_annotator=prediction_annotator,
+            reference_annotator=reference_annotator,
+            overlap=overlap,
+            schema=schema,
+        )
+        # JSON object keys are strings
+        record = cached_records.get(str(file_id))
+        if record is not None and record["hash"] == task_hash:
+            scores.reused_file_ids.append(file_id)
+        else:
+            annotator_to_file = organize_file_annotations_by_annotator(
+                organize_file_by_annotator_id(
+                    raw_file_dictionary, schema, annotator_ids_to_skip
+                ),
+                id_to_unique_annotator,
+                annotator_ids_to_ignore,
+            )
+            entity_totals, relation_totals = count_file_pair(
+                (
+                    annotator_to_file.get(prediction_annotator),
+                    annotator_to_file.get(reference_annotator),
+                ),
+                overlap=overlap,
+            )
+            record = {
+                "hash": task_hash,
+                "entity": totals_to_list(entity_totals),
+                "relation": totals_to_list(relation_totals),
+            }
+            scores.rescored_file_ids.append(file_id)
+        file_records[str(file_id)] = record
+        scores.entity_totals.update(list_to_totals(record["entity"]))
+        scores.relation_totals.update(list_to_totals(record["relation"]))
+    write_incremental_cache(cache_path, file_records)
+    return scores
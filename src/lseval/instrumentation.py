@@ -0,0 +1,106 @@
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from inspect import isgeneratorfunction
+from time import perf_counter
+
+# Opt-in timing and counters for the parsing, scoring and
+# adjudication stages.  When no report is active every hook
+# is a single global lookup and comparison against None.
+# The report is per process, nothing is collected
+# from ProcessPoolExecutor workers
+
+
+@dataclass
+class InstrumentationReport:
+    stage_seconds: Counter[str] = field(default_factory=Counter)
+    stage_calls: Counter[str] = field(default_factory=Counter)
+    counters: Counter[str] = field(default_factory=Counter)
+    wall_seconds: float = 0.0
+
+    def add_stage_time(self, stage: str, seconds: float) -> None:
+        self.stage_seconds[stage] += seconds
+
+    def timed_iteration[T](self, stage: str, iterator: Iterator[T]) -> Iterator[T]:
+        # Only time spent inside the wrapped generator counts,
+        # not time the consumer spends between items
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration as stop:
+                self.add_stage_time(stage, perf_counter() - start)
+                return stop.value
+            self.add_stage_time(stage, perf_counter() - start)
+            yield item
+
+    # Stage times are inclusive, e.g. adjudication includes
+    # adjudication_clustering, so they needn't sum to wall_seconds
+    def to_dict(self) -> dict:
+        return {
+            "wall_seconds": self.wall_seconds,
+            "stages": {
+                stage: {
+                    "seconds": self.stage_seconds[stage],
+                    "calls": self.stage_calls[stage],
+                }
+                for stage in sorted(self.stage_calls.keys())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+_active_report: InstrumentationReport | None = None
+
+
+@contextmanager
+def instrument() -> Iterator[InstrumentationReport]:
+    global _active_report
+    previous_report = _active_report
+    report = InstrumentationReport()
+    _active_report = report
+    start = perf_counter()
+    try:
+        yield report
+    finally:
+        report.wall_seconds = perf_counter() - start
+        _active_report = previous_report
+
+
+def increment(counter: str, amount: int = 1) -> None:
+    if _active_report is not None:
+        _active_report.counters[counter] += amount
+
+
+def timed[**P, R](stage: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        if isgeneratorfunction(function):
+
+            @wraps(function)
+            def generator_wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                generator = function(*args, **kwargs)
+                report = _active_report
+                if report is None:
+                    return generator
+                report.stage_calls[stage] += 1
+                return report.timed_iteration(stage, generator)
+
+            return generator_wrapper
+
+        @wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            report = _active_report
+            if report is None:
+                return function(*args, **kwargs)
+            report.stage_calls[stage] += 1
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                report.add_stage_time(stage, perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,207 @@
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from itertools import combinations
+
+import numpy as np
+
+from .datatypes import AnnotatedFile, SingleAnnotatorCorpus
+
+# Label code of characters (or tokens) outside every entity,
+# entity labels are coded from 1 in LabelArrays.labels order
+OUTSIDE = 0
+
+TOKEN_PATTERN = re.compile(r"\S+")
+
+
+# Every annotator's labelling of every unit (character or
+# whitespace token) of the files all of them annotated,
+# label_codes[a, u] being annotator a's label for unit u.
+# Units of file_ids[i] are offsets[i]:offsets[i + 1]
+@dataclass(frozen=True)
+class LabelArrays[T]:
+    annotators: Sequence[T]
+    labels: Sequence[str | None]
+    file_ids: np.ndarray
+    offsets: np.ndarray
+    label_codes: np.ndarray
+
+    def total_codes(self) -> int:
+        return len(self.labels) + 1
+
+
+@dataclass(frozen=True)
+class KappaScores:
+    observed_agreement: float
+    expected_agreement: float
+    kappa: float
+    units: int
+
+
+def paint_file(
+    annotated_file: AnnotatedFile,
+    label_to_code: Mapping[str | None, int],
+    dtype: np.dtype,
+) -> np.ndarray:
+    label_codes = np.full(len(annotated_file.file_text), OUTSIDE, dtype=dtype)
+    # Outermost first so nested entities keep their own label
+    for entity in sorted(
+        annotated_file.entities, key=lambda entity: (entity.span[0], -entity.span[1])
+    ):
+        label_codes[entity.span[0] : entity.span[1]] = label_to_code[entity.label]
+    return label_codes
+
+
+def get_token_starts(file_text: str) -> np.ndarray:
+    return np.fromiter(
+        (match.start() for match in TOKEN_PATTERN.finditer(file_text)),
+        dtype=np.int64,
+    )
+
+
+# Files not every annotator got to are left out, Fleiss' kappa
+# needs the same raters on every unit.  With tokens each whitespace
+# token takes the label of its first character
+def build_label_arrays[T](
+    annotator_to_corpus: Mapping[T, SingleAnnotatorCorpus], tokens: bool = False
+) -> LabelArrays[T]:
+    annotators = tuple(annotator_to_corpus.keys())
+    annotator_id_to_file = [
+        {
+            annotated_file.file_id: annotated_file
+            for annotated_file in annotator_to_corpus[annotator].annotated_files
+        }
+        for annotator in annotators
+    ]
+    shared_file_ids = sorted(
+        set.intersection(
+            *(set(id_to_file.keys()) for id_to_file in annotator_id_to_file)
+        )
+        if annotator_id_to_file
+        else set()
+    )
+    label_to_code = {}
+    for id_to_file in annotator_id_to_file:
+        for file_id in shared_file_ids:
+            for entity in id_to_file[file_id].entities:
+                label_to_code.setdefault(entity.label, len(label_to_code) + 1)
+    dtype = np.min_scalar_type(len(label_to_code))
+
+    file_units = []
+    annotator_file_codes = [[] for _ in annotators]
+    for file_id in shared_file_ids:
+        token_starts = (
+            get_token_starts(annotator_id_to_file[0][file_id].file_text)
+            if tokens
+            else None
+        )
+        for position, id_to_file in enumerate(annotator_id_to_file):
+            label_codes = paint_file(id_to_file[file_id], label_to_code, dtype)
+            if token_starts is not None:
+                label_codes = label_codes[token_starts]
+            annotator_file_codes[position].append(label_codes)
+        file_units.append(len(annotator_file_codes[0][-1]) if annotators else 0)
+    return LabelArrays(
+        annotators=annotators,
+        labels=tuple(label_to_code.keys()),
+        file_ids=np.array(shared_file_ids, dtype=np.int64),
+        offsets=np.concatenate(([0], np.cumsum(file_units, dtype=np.int64))),
+        label_codes=np.stack(
+            [
+                np.concatenate(file_codes) if file_codes else np.empty(0, dtype=dtype)
+                for file_codes in annotator_file_codes
+            ]
+        )
+        if annotators
+        else np.empty((0, 0), dtype=dtype),
+    )
+
+
+def kappa_from_agreement(
+    observed_agreement: float, expected_agreement: float, units: int
+) -> KappaScores:
+    if units == 0 or expected_agreement == 1.0:
+        kappa = float("nan")
+    else:
+        kappa = (observed_agreement - expected_agreement) / (1.0 - expected_agreement)
+    return KappaScores(
+        observed_agreement=float(observed_agreement),
+        expected_agreement=float(expected_agreement),
+        kappa=float(kappa),
+        units=units,
+    )
+
+
+# (total_codes, total_codes) counts of units labelled i by the first
+# annotator and j by the second, one bincount over the whole corpus
+def confusion_counts(
+    first_codes: np.ndarray, second_codes: np.ndarray, total_codes: int
+) -> np.ndarray:
+    return np.bincount(
+        first_codes.astype(np.int64) * total_codes + second_codes,
+        minlength=total_codes * total_codes,
+    ).reshape(total_codes, total_codes)
+
+
+def cohens_kappa(
+    first_codes: np.ndarray, second_codes: np.ndarray, total_codes: int
+) -> KappaScores:
+    units = len(first_codes)
+    if units == 0:
+        return kappa_from_agreement(float("nan"), float("nan"), units)
+    confusion = confusion_counts(first_codes, second_codes, total_codes)
+    observed_agreement = np.trace(confusion) / units
+    expected_agreement = (
+        np.dot(confusion.sum(axis=1), confusion.sum(axis=0)) / units / units
+    )
+    return kappa_from_agreement(observed_agreement, expected_agreement, units)
+
+
+# Per unit agreement is the fraction of rater pairs agreeing on it, summed
+# a rater pair at a time rather than through the units x categories matrix
+def fleiss_kappa(label_codes: np.ndarray, total_codes: int) -> KappaScores:
+    total_raters, units = label_codes.shape
+    if units == 0 or total_raters < 2:
+        return kappa_from_agreement(float("nan"), float("nan"), units)
+    agreeing_pairs = np.zeros(units, dtype=np.int64)
+    for first, second in combinations(range(total_raters), r=2):
+        agreeing_pairs += label_codes[first] == label_codes[second]
+    observed_agreement = np.mean(agreeing_pairs) / (
+        total_raters * (total_raters - 1) / 2
+    )
+    code_proportions = np.bincount(label_codes.reshape(-1), minlength=total_codes) / (
+        total_raters * units
+    )
+    expected_agreement = np.dot(code_proportions, code_proportions)
+    return kappa_from_agreement(observed_agreement, expected_agreement, units)
+
+
+def pairwise_cohens_kappa[T](label_arrays: LabelArrays[T]) -> np.ndarray:
+    total_annotators = len(label_arrays.annotators)
+    kappa_matrix = np.eye(total_annotators)
+    for first, second in combinations(range(total_annotators), r=2):
+        kappa = cohens_kappa(
+            label_arrays.label_codes[first],
+            label_arrays.label_codes[second],
+            label_arrays.total_codes(),
+        ).kappa
+        kappa_matrix[first, second] = kappa
+        kappa_matrix[second, first] = kappa
+    return kappa_matrix
+
+
+def corpus_fleiss_kappa[T](label_arrays: LabelArrays[T]) -> KappaScores:
+    return fleiss_kappa(label_arrays.label_codes, label_arrays.total_codes())
+
+
+# (annotators, total_codes) counts of units each annotator
+# gave each code, column OUTSIDE being the unlabelled units
+def label_coverage[T](label_arrays: LabelArrays[T]) -> np.ndarray:
+    total_codes = label_arrays.total_codes()
+    total_annotators = len(label_arrays.label_codes)
+    # Offset each annotator's codes so one bincount covers all of them
+    annotator_offsets = np.arange(total_annotators, dtype=np.int64)[:, None]
+    return np.bincount(
+        (label_arrays.label_codes + annotator_offsets * total_codes).reshape(-1),
+        minlength=total_annotators * total_codes,
+    ).reshape(total_annotators, total_codes)
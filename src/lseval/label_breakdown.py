@@ -0,0 +1,188 @@
+from collections import Counter, defaultdict
+from collections.abc import Callable, Collection, Hashable, Iterable, Mapping
+from dataclasses import dataclass, field
+from functools import partial
+from math import isnan
+from operator import attrgetter
+from statistics import mean
+
+from .correctness_matrix import Correctness, CorrectnessMatrix, score_totals
+from .datatypes import AnnotatedFile, Entity, Relation, SingleAnnotatorCorpus
+from .score import (
+    build_entity_correctness_matrix,
+    build_relation_correctness_matrix,
+    count_entity_correctness,
+    count_relation_correctness,
+    map_file_pairs,
+    pair_files_by_id,
+)
+
+
+# Tallies per label (Entity.label or Relation.label) with micro
+# and macro aggregates, scores as in correctness_matrix.score_totals
+@dataclass(frozen=True)
+class LabelBreakdown[L]:
+    label_to_totals: Mapping[L, Counter[Correctness]] = field(default_factory=dict)
+
+    def get_label_scores(self) -> Mapping[L, tuple[float, float, float, int]]:
+        return {
+            label: score_totals(correctness_totals)
+            for label, correctness_totals in self.label_to_totals.items()
+        }
+
+    def get_micro_totals(self) -> Counter[Correctness]:
+        micro_totals = Counter(
+            {
+                Correctness.TRUE_POSITIVE: 0,
+                Correctness.TRUE_NEGATIVE: 0,
+                Correctness.FALSE_POSITIVE: 0,
+                Correctness.FALSE_NEGATIVE: 0,
+            }
+        )
+        for correctness_totals in self.label_to_totals.values():
+            micro_totals.update(correctness_totals)
+        return micro_totals
+
+    def get_micro_scores(self) -> tuple[float, float, float, int]:
+        return score_totals(self.get_micro_totals())
+
+    # Unweighted mean over labels.  A label which was predicted or is in
+    # the reference but has an undefined score (e.g. nothing predicted,
+    # or no true positives for F1) scores 0 there, otherwise missing a
+    # label entirely would raise the mean.  Only labels with neither
+    # predictions nor references are left out
+    def get_macro_scores(self) -> tuple[float, float, float, int]:
+        label_scores = [
+            score_totals(correctness_totals)
+            for correctness_totals in self.label_to_totals.values()
+            if correctness_totals[Correctness.TRUE_POSITIVE]
+            + correctness_totals[Correctness.FALSE_POSITIVE]
+            + correctness_totals[Correctness.FALSE_NEGATIVE]
+            > 0
+        ]
+
+        def macro_average(scores: Iterable[float]) -> float:
+            zeroed_scores = [0.0 if isnan(score) else score for score in scores]
+            return mean(zeroed_scores) if zeroed_scores else float("nan")
+
+        return (
+            macro_average(f1 for f1, _, _, _ in label_scores),
+            macro_average(precision for _, precision, _, _ in label_scores),
+            macro_average(recall for _, _, recall, _ in label_scores),
+            sum(support for _, _, _, support in label_scores),
+        )
+
+
+def group_by_label[T, L: Hashable](
+    items: Iterable[T], get_label: Callable[[T], L] = attrgetter("label")
+) -> Mapping[L, list[T]]:
+    label_to_items = defaultdict(list)
+    for item in items:
+        label_to_items[get_label(item)].append(item)
+    return label_to_items
+
+
+# Each entity is only ever matched within its own label, so grouping
+# first is one matching pass over the file however many labels there
+# are, instead of one per label with a filter in front
+def entity_label_correctness_matrices(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    overlap: bool,
+) -> Mapping[str | None, CorrectnessMatrix[Entity]]:
+    label_to_predicted = group_by_label(predicted_entities)
+    label_to_reference = group_by_label(reference_entities)
+    return {
+        label: build_entity_correctness_matrix(
+            label_to_predicted.get(label, ()),
+            label_to_reference.get(label, ()),
+            overlap=overlap,
+        )
+        for label in label_to_predicted.keys() | label_to_reference.keys()
+    }
+
+
+# Relations never match across labels in either mode
+# so this is the usual matrix split up by label
+def relation_label_correctness_matrices(
+    predicted_relations: Collection[Relation],
+    reference_relations: Collection[Relation],
+    overlap: bool,
+) -> Mapping[tuple[str, ...], CorrectnessMatrix[Relation]]:
+    label_to_predicted = group_by_label(predicted_relations)
+    label_to_reference = group_by_label(reference_relations)
+    return {
+        label: build_relation_correctness_matrix(
+            frozenset(label_to_predicted.get(label, ())),
+            frozenset(label_to_reference.get(label, ())),
+            overlap=overlap,
+        )
+        for label in label_to_predicted.keys() | label_to_reference.keys()
+    }
+
+
+def count_file_pair_by_label(
+    file_pair: tuple[AnnotatedFile | None, AnnotatedFile | None],
+    overlap: bool,
+) -> tuple[
+    Mapping[str | None, Counter[Correctness]],
+    Mapping[tuple[str, ...], Counter[Correctness]],
+]:
+    predicted_file, reference_file = file_pair
+    label_to_predicted_entities = group_by_label(
+        predicted_file.entities if predicted_file is not None else ()
+    )
+    label_to_reference_entities = group_by_label(
+        reference_file.entities if reference_file is not None else ()
+    )
+    label_to_predicted_relations = group_by_label(
+        predicted_file.relations if predicted_file is not None else ()
+    )
+    label_to_reference_relations = group_by_label(
+        reference_file.relations if reference_file is not None else ()
+    )
+    return (
+        {
+            label: count_entity_correctness(
+                label_to_predicted_entities.get(label, ()),
+                label_to_reference_entities.get(label, ()),
+                overlap=overlap,
+            )
+            for label in label_to_predicted_entities.keys()
+            | label_to_reference_entities.keys()
+        },
+        {
+            label: count_relation_correctness(
+                label_to_predicted_relations.get(label, ()),
+                label_to_reference_relations.get(label, ()),
+                overlap=overlap,
+            )
+            for label in label_to_predicted_relations.keys()
+            | label_to_reference_relations.keys()
+        },
+    )
+
+
+def count_corpora_by_label(
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_corpus: SingleAnnotatorCorpus,
+    overlap: bool,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> tuple[LabelBreakdown[str | None], LabelBreakdown[tuple[str, ...]]]:
+    label_to_entity_totals = defaultdict(Counter)
+    label_to_relation_totals = defaultdict(Counter)
+    for label_to_entity_counts, label_to_relation_counts in map_file_pairs(
+        partial(count_file_pair_by_label, overlap=overlap),
+        pair_files_by_id(predicted_corpus, reference_corpus),
+        max_workers,
+        chunksize,
+    ):
+        for label, entity_counts in label_to_entity_counts.items():
+            label_to_entity_totals[label].update(entity_counts)
+        for label, relation_counts in label_to_relation_counts.items():
+            label_to_relation_totals[label].update(relation_counts)
+    return (
+        LabelBreakdown(label_to_totals=dict(label_to_entity_totals)),
+        LabelBreakdown(label_to_totals=dict(label_to_relation_totals)),
+    )
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+
+# Maximum weight bipartite matching over sparse edge lists,
+# (left index, right index, weight) with positive weights.
+# Overlap graphs of real files fall apart into many small
+# connected components, so each is solved on its own with
+# the Hungarian algorithm over just its own nodes
+
+
+def find_root(parents: dict, node: object) -> object:
+    root = node
+    while parents[root] != root:
+        root = parents[root]
+    # Path compression
+    while parents[node] != root:
+        parents[node], node = root, parents[node]
+    return root
+
+
+def connected_components(
+    edges: Iterable[tuple[int, int, int]],
+) -> Sequence[Sequence[tuple[int, int, int]]]:
+    parents = {}
+    edges = list(edges)
+    for left, right, _ in edges:
+        left_node = (0, left)
+        right_node = (1, right)
+        parents.setdefault(left_node, left_node)
+        parents.setdefault(right_node, right_node)
+        left_root = find_root(parents, left_node)
+        right_root = find_root(parents, right_node)
+        if left_root != right_root:
+            parents[right_root] = left_root
+    root_to_edges = defaultdict(list)
+    for edge in edges:
+        root_to_edges[find_root(parents, (0, edge[0]))].append(edge)
+    return list(root_to_edges.values())
+
+
+# Shortest augmenting path Hungarian algorithm, O(rows^2 * columns),
+# maximising the total weight.  Needs rows <= columns
+def hungarian(weights: Sequence[Sequence[int]]) -> Sequence[tuple[int, int]]:
+    total_rows = len(weights)
+    total_columns = len(weights[0])
+    infinity = float("inf")
+    # 1-indexed with row/column 0 as the dummy start
+    row_potentials = [0] * (total_rows + 1)
+    column_potentials = [0] * (total_columns + 1)
+    column_to_row = [0] * (total_columns + 1)
+    previous_column = [0] * (total_columns + 1)
+    for row in range(1, total_rows + 1):
+        column_to_row[0] = row
+        current_column = 0
+        minimum_slack = [infinity] * (total_columns + 1)
+        visited = [False] * (total_columns + 1)
+        while True:
+            visited[current_column] = True
+            current_row = column_to_row[current_column]
+            row_weights = weights[current_row - 1]
+            delta = infinity
+            next_column = 0
+            for column in range(1, total_columns + 1):
+                if visited[column]:
+                    continue
+                slack = (
+                    -row_weights[column - 1]
+                    - row_potentials[current_row]
+                    - column_potentials[column]
+                )
+                if slack < minimum_slack[column]:
+                    minimum_slack[column] = slack
+                    previous_column[column] = current_column
+                if minimum_slack[column] < delta:
+                    delta = minimum_slack[column]
+                    next_column = column
+            for column in range(total_columns + 1):
+                if visited[column]:
+                    row_potentials[column_to_row[column]] += delta
+                    column_potentials[column] -= delta
+                else:
+                    minimum_slack[column] -= delta
+            current_column = next_column
+            if column_to_row[current_column] == 0:
+                break
+        while current_column != 0:
+            previous = previous_column[current_column]
+            column_to_row[current_column] = column_to_row[previous]
+            current_column = previous
+    return [
+        (column_to_row[column] - 1, column - 1)
+        for column in range(1, total_columns + 1)
+        if column_to_row[column] != 0
+    ]
+
+
+def component_matching(
+    edges: Sequence[tuple[int, int, int]],
+) -> Sequence[tuple[int, int]]:
+    if len(edges) == 1:
+        left, right, _ = edges[0]
+        return [(left, right)]
+    lefts = sorted({left for left, _, _ in edges})
+    rights = sorted({right for _, right, _ in edges})
+    transposed = len(lefts) > len(rights)
+    if transposed:
+        lefts, rights = rights, lefts
+        edges = [(right, left, weight) for left, right, weight in edges]
+    left_to_row = {left: row for row, left in enumerate(lefts)}
+    right_to_column = {right: column for column, right in enumerate(rights)}
+    # Missing edges weigh 0, the same as leaving both unmatched,
+    # so assignments along them are dropped afterwards
+    weights = [[0] * len(rights) for _ in lefts]
+    for left, right, weight in edges:
+        weights[left_to_row[left]][right_to_column[right]] = weight
+    matching = [
+        (lefts[row], rights[column])
+        for row, column in hungarian(weights)
+        if weights[row][column] > 0
+    ]
+    if transposed:
+        return [(left, right) for right, left in matching]
+    return matching
+
+
+# Each connected component is solved with a dense Hungarian over
+# its own nodes, O(n^3) in the component's size, so the cost is
+# cubic in the largest component rather than in the whole file.
+# One big component (e.g. a long span overlapping many short ones,
+# chained together) still costs the full cubic time
+def maximum_weight_matching(
+    edges: Iterable[tuple[int, int, int]],
+) -> Sequence[tuple[int, int]]:
+    return sorted(
+        pair
+        for component_edges in connected_components(edges)
+        for pair in component_matching(component_edges)
+    )
+
+
+# Weights which make the matching maximise the number of pairs first
+# and total overlap second, anything over the sum of every overlap
+# outweighs any trade of one pair for more overlap
+def cardinality_first_weights(
+    overlap_edges: Sequence[tuple[int, int, int]],
+) -> Sequence[tuple[int, int, int]]:
+    pair_weight = sum(overlap for _, _, overlap in overlap_edges) + 1
+    return [
+        (left, right, pair_weight + overlap) for left, right, overlap in overlap_edges
+    ]
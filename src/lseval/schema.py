@@ -0,0 +1,232 @@
+import copy
+import hashlib
+import operator
+import xml.etree.ElementTree as ET
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from enum import StrEnum
+from os import PathLike
+from typing import Any
+
+from .datatypes import DocTimeRel
+
+# Label Studio label config (e.g. schema.xml) compiled once into a
+# from_name -> decoder table, so turning an annotation into Entity
+# fields is a dictionary lookup rather than a chain of from_name checks
+
+
+class TagKind(StrEnum):
+    LABELS = "Labels"
+    CHOICES = "Choices"
+    TEXT_AREA = "TextArea"
+
+
+def get_value(annotation: dict, description: str) -> dict:
+    annotation_value = annotation.get("value")
+    if annotation_value is None:
+        raise ValueError(f"Missing value field for {description} entity: {annotation}")
+    return annotation_value
+
+
+def decode_dtr(annotation: dict) -> DocTimeRel:
+    dtr_choices = get_value(annotation, "DTR").get("choices", [])
+    if len(dtr_choices) != 1:
+        raise ValueError(f"Invalid values for DTR choices: {dtr_choices}")
+    # Don't worry there's a _missing_ method
+    return DocTimeRel(dtr_choices[0])
+
+
+def decode_cuis(annotation: dict) -> tuple[str, ...]:
+    return tuple(
+        sorted(
+            map(
+                str.upper,
+                map(
+                    str.strip,
+                    filter(
+                        operator.is_not_none,
+                        get_value(annotation, "CUIS").get("text", []),
+                    ),
+                ),
+            )
+        )
+    )
+
+
+def decode_text(annotation: dict) -> str | None:
+    return get_value(annotation, "DTR/Event").get("text", [])
+
+
+def decode_label(annotation: dict) -> str | None:
+    labels = get_value(annotation, "event type").get("labels", [])
+    if len(labels) != 1:
+        raise ValueError(f"Invalid values for event type labels: {labels}")
+    return str(labels[0])
+
+
+# Entity fields a tag can fill, and how
+FIELD_DECODERS: Mapping[str, Callable[[dict], Any]] = {
+    "label": decode_label,
+    "dtr": decode_dtr,
+    "cuis": decode_cuis,
+}
+
+# Which Choices and TextArea tags feed which Entity field,
+# every Labels tag gives the entity's label (and text)
+DEFAULT_ATTRIBUTE_FIELDS: Mapping[str, str] = {"DocTimeRel": "dtr", "CUI": "cuis"}
+
+
+# entity_field is None for tags Entity has no field for
+# (e.g. the IAA choices adjudication adds), those are skipped
+@dataclass(frozen=True)
+class TagDecoder:
+    name: str
+    kind: TagKind
+    entity_field: str | None
+    values: tuple[str, ...] = ()
+
+    def decode(self, annotation: dict) -> Any:
+        if self.entity_field is None:
+            raise ValueError(f"{self.kind} {self.name} doesn't decode to a field")
+        return FIELD_DECODERS[self.entity_field](annotation)
+
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    from_name_to_decoder: Mapping[str, TagDecoder] = field(default_factory=dict)
+    relation_labels: tuple[str, ...] = ()
+    text_name: str = "text"
+
+    def get_decoder(self, from_name: str) -> TagDecoder | None:
+        decoder = self.from_name_to_decoder.get(from_name)
+        if decoder is None or decoder.entity_field is None:
+            return None
+        return decoder
+
+    # Stable across processes, for cache keys
+    def get_fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for name, decoder in sorted(self.from_name_to_decoder.items()):
+            digest.update(
+                repr(
+                    (name, str(decoder.kind), decoder.entity_field, decoder.values)
+                ).encode()
+            )
+        digest.update(repr((self.relation_labels, self.text_name)).encode())
+        return digest.hexdigest()
+
+
+def compile_tags(
+    root: ET.Element, attribute_fields: Mapping[str, str]
+) -> Iterable[tuple[str, TagDecoder]]:
+    child_tags = {
+        TagKind.LABELS: "Label",
+        TagKind.CHOICES: "Choice",
+        TagKind.TEXT_AREA: None,
+    }
+    for element in root.iter():
+        if element.tag not in child_tags.keys():
+            continue
+        kind = TagKind(element.tag)
+        name = element.attrib["name"]
+        child_tag = child_tags[kind]
+        yield (
+            name,
+            TagDecoder(
+                name=name,
+                kind=kind,
+                entity_field="label"
+                if kind == TagKind.LABELS
+                else attribute_fields.get(name),
+                values=tuple(child.attrib["value"] for child in element.iter(child_tag))
+                if child_tag is not None
+                else (),
+            ),
+        )
+
+
+def read_label_config(label_config: str | PathLike | ET.ElementTree) -> ET.ElementTree:
+    if isinstance(label_config, ET.ElementTree):
+        return label_config
+    return ET.parse(label_config)
+
+
+def compile_label_config(
+    label_config: str | PathLike | ET.ElementTree,
+    attribute_fields: Mapping[str, str] = DEFAULT_ATTRIBUTE_FIELDS,
+) -> CompiledSchema:
+    root = read_label_config(label_config).getroot()
+    text_tag = next(root.iter("Text"), None)
+    return CompiledSchema(
+        from_name_to_decoder=dict(compile_tags(root, attribute_fields)),
+        relation_labels=tuple(
+            relation.attrib["value"] for relation in root.iter("Relation")
+        ),
+        text_name=text_tag.attrib["name"] if text_tag is not None else "text",
+    )
+
+
+# What the parser did before label configs were compiled,
+# label from Event, DocTimeRel and CUIs, everything else skipped
+DEFAULT_SCHEMA = CompiledSchema(
+    from_name_to_decoder={
+        "Event": TagDecoder(name="Event", kind=TagKind.LABELS, entity_field="label"),
+        "DocTimeRel": TagDecoder(
+            name="DocTimeRel", kind=TagKind.CHOICES, entity_field="dtr"
+        ),
+        "CUI": TagDecoder(name="CUI", kind=TagKind.TEXT_AREA, entity_field="cuis"),
+    }
+)
+
+
+# Adds the choices adjudication writes, one per annotator, to the
+# IAA Choices tag and the Relations tag, creating either if missing.
+# Returns a new tree, label_config is left as is
+def add_annotator_choices(
+    label_config: str | PathLike | ET.ElementTree,
+    annotators: Iterable[str],
+    choices_name: str = "IAA",
+) -> ET.ElementTree:
+    tree = copy.deepcopy(read_label_config(label_config))
+    root = tree.getroot()
+    schema = compile_label_config(tree)
+    annotators = list(dict.fromkeys(annotators))
+
+    choices = next(
+        (
+            element
+            for element in root.iter("Choices")
+            if element.attrib.get("name") == choices_name
+        ),
+        None,
+    )
+    if choices is None:
+        # Next to the text it annotates
+        text_parent = next(
+            (
+                parent
+                for parent in root.iter()
+                for child in parent
+                if child.tag == "Text"
+            ),
+            root,
+        )
+        choices = ET.SubElement(
+            text_parent,
+            "Choices",
+            {"name": choices_name, "toName": schema.text_name, "perRegion": "true"},
+        )
+    existing_choices = {choice.attrib["value"] for choice in choices.iter("Choice")}
+    for annotator in annotators:
+        if annotator not in existing_choices:
+            ET.SubElement(choices, "Choice", {"value": annotator})
+
+    relations = next(root.iter("Relations"), None)
+    if relations is None:
+        relations = ET.Element("Relations")
+        root.insert(0, relations)
+    existing_relations = set(schema.relation_labels)
+    for annotator in annotators:
+        if annotator not in existing_relations:
+            ET.SubElement(relations, "Relation", {"value": annotator})
+    return tree
@@ -1,15 +1,35 @@
 import logging
-from collections import defaultdict, deque
-from collections.abc import Collection, Set
+from collections import Counter, defaultdict
+from collections.abc import (
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+    Set,
+)
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from itertools import chain
-from operator import attrgetter
+from operator import attrgetter, itemgetter
 
-from .correctness_matrix import CorrectnessMatrix
+from .correctness_matrix import (
+    Correctness,
+    CorrectnessMatrix,
+    merge_correctness_matrices,
+)
 from .datatypes import (
+    AnnotatedFile,
     Entity,
     Relation,
+    SingleAnnotatorCorpus,
+    overlap_length,
     overlap_match,
 )
+from .instrumentation import increment, timed
+from .matching import cardinality_first_weights, maximum_weight_matching
+from .span_index import SpanIndex, build_span_index
 
 logger = logging.getLogger(__name__)
 
@@ -29,40 +49,90 @@ def build_entity_correctness_matrix(
     predicted_entities: Collection[Entity],
     reference_entities: Collection[Entity],
     overlap: bool,
+    brute_force: bool = False,
+    one_to_one: bool = False,
 ) -> CorrectnessMatrix:
+    if one_to_one:
+        return one_to_one_entity_correctness_matrix(
+            predicted_entities, reference_entities, overlap=overlap
+        )
     if overlap:
+        if brute_force:
+            return brute_force_overlap_entity_correctness_matrix(
+                predicted_entities, reference_entities
+            )
         return overlap_entity_correctness_matrix(predicted_entities, reference_entities)
     return exact_entity_correctness_matrix(predicted_entities, reference_entities)
 
 
-def overlap_entity_correctness_matrix(
-    predicted_entities: Collection[Entity], reference_entities: Collection[Entity]
-) -> CorrectnessMatrix:
-    reference_span_to_entities = defaultdict(deque)
-    for entity in reference_entities:
-        reference_span_to_entities[entity.span].append(entity)
+def get_span_to_entities(
+    entities: Iterable[Entity], annotator_role: str
+) -> Mapping[tuple[int, int], Sequence[Entity]]:
+    span_to_entities = defaultdict(list)
+    for entity in entities:
+        span_to_entities[entity.span].append(entity)
 
-    for span, entities in reference_span_to_entities.items():
-        if len(entities) > 1:
+    for span, span_entities in span_to_entities.items():
+        if len(span_entities) > 1:
             logger.warning(
-                "%s reference entities from %d share the span %s",
-                ", ".join(sorted(map(attrgetter("label_studio_id"), entities))),
-                entities[0].file_id,
+                "%s %s entities from %d share the span %s",
+                ", ".join(sorted(map(attrgetter("label_studio_id"), span_entities))),
+                annotator_role,
+                span_entities[0].file_id,
                 str(span),
             )
+    return span_to_entities
 
-    predicted_span_to_entities = defaultdict(deque)
-    for entity in predicted_entities:
-        predicted_span_to_entities[entity.span].append(entity)
 
+# Sort and sweep version of the below, overlapping
+# isn't transitive so we can't merge spans into clusters,
+# but for each span we only need to know whether any span
+# from the other side overlaps it, which SpanIndex answers
+# with a bisect.  O((n + m) log(n + m)) instead of O(n * m)
+@timed("overlap_entity_matching")
+def overlap_entity_correctness_matrix(
+    predicted_entities: Collection[Entity], reference_entities: Collection[Entity]
+) -> CorrectnessMatrix:
+    reference_span_to_entities = get_span_to_entities(reference_entities, "reference")
+    predicted_span_to_entities = get_span_to_entities(predicted_entities, "predicted")
+    # One index query per distinct span
+    increment(
+        "overlap_comparisons",
+        len(reference_span_to_entities) + len(predicted_span_to_entities),
+    )
+    reference_index = build_span_index(
+        (span, span) for span in reference_span_to_entities.keys()
+    )
+    predicted_index = build_span_index(
+        (span, span) for span in predicted_span_to_entities.keys()
+    )
+    true_positive_entities = set()
+    false_positive_entities = set()
+    false_negative_entities = set()
     for span, entities in predicted_span_to_entities.items():
-        if len(entities) > 1:
-            logger.warning(
-                "%s predicted entities from %d share the span %s",
-                ", ".join(sorted(map(attrgetter("label_studio_id"), entities))),
-                entities[0].file_id,
-                str(span),
-            )
+        if reference_index.overlaps_any(span):
+            true_positive_entities.update(entities)
+        else:
+            false_positive_entities.update(entities)
+    for span, entities in reference_span_to_entities.items():
+        if not predicted_index.overlaps_any(span):
+            false_negative_entities.update(entities)
+
+    return CorrectnessMatrix(
+        true_positives=true_positive_entities,
+        false_positives=false_positive_entities,
+        false_negatives=false_negative_entities,
+    )
+
+
+# Original quadratic implementation, kept as a reference
+# for checking the sweep version
+@timed("overlap_entity_matching")
+def brute_force_overlap_entity_correctness_matrix(
+    predicted_entities: Collection[Entity], reference_entities: Collection[Entity]
+) -> CorrectnessMatrix:
+    reference_span_to_entities = get_span_to_entities(reference_entities, "reference")
+    predicted_span_to_entities = get_span_to_entities(predicted_entities, "predicted")
     sorted_reference_spans = sorted(reference_span_to_entities.keys())
     sorted_predicted_spans = sorted(predicted_span_to_entities.keys())
     true_positive_entities = set()
@@ -94,35 +164,13 @@ def overlap_entity_correctness_matrix(
     )
 
 
+@timed("exact_entity_matching")
 def exact_entity_correctness_matrix(
     predicted_entities: Collection[Entity], reference_entities: Collection[Entity]
 ) -> CorrectnessMatrix:
     # want to keep this span level due to the extension logic, can re-work it later
-    reference_span_to_entities = defaultdict(list)
-    for entity in reference_entities:
-        reference_span_to_entities[entity.span].append(entity)
-
-    for span, entities in reference_span_to_entities.items():
-        if len(entities) > 1:
-            logger.warning(
-                "%s reference entities from %d share the span %s",
-                ", ".join(sorted(map(attrgetter("label_studio_id"), entities))),
-                entities[0].file_id,
-                str(span),
-            )
-
-    predicted_span_to_entities = defaultdict(list)
-    for entity in predicted_entities:
-        predicted_span_to_entities[entity.span].append(entity)
-
-    for span, entities in predicted_span_to_entities.items():
-        if len(entities) > 1:
-            logger.warning(
-                "%s predicted entities from %d share the span %s",
-                ", ".join(sorted(map(attrgetter("label_studio_id"), entities))),
-                entities[0].file_id,
-                str(span),
-            )
+    reference_span_to_entities = get_span_to_entities(reference_entities, "reference")
+    predicted_span_to_entities = get_span_to_entities(predicted_entities, "predicted")
     true_positive_entities = set(
         chain.from_iterable(
             predicted_span_to_entities.get(predicted_span, [])
@@ -152,20 +200,135 @@ def exact_entity_correctness_matrix(
     )
 
 
+# Every (predicted, reference) pair the entity matchers above
+# consider a match, for when which entity matched which matters
+# and not just whether it matched.  With overlap an entity can be
+# in several pairs, one per entity it overlaps on the other side
+def entity_alignments(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    overlap: bool,
+) -> Iterator[tuple[Entity, Entity]]:
+    reference_span_to_entities = get_span_to_entities(reference_entities, "reference")
+    predicted_span_to_entities = get_span_to_entities(predicted_entities, "predicted")
+    if overlap:
+        reference_index = build_span_index(
+            (span, span) for span in reference_span_to_entities.keys()
+        )
+        increment("overlap_comparisons", len(predicted_span_to_entities))
+        span_pairs = (
+            (predicted_span, reference_span)
+            for predicted_span in predicted_span_to_entities.keys()
+            for reference_span in reference_index.overlapping(predicted_span)
+        )
+    else:
+        span_pairs = (
+            (span, span)
+            for span in predicted_span_to_entities.keys()
+            & reference_span_to_entities.keys()
+        )
+    for predicted_span, reference_span in span_pairs:
+        for predicted_entity in predicted_span_to_entities[predicted_span]:
+            for reference_entity in reference_span_to_entities[reference_span]:
+                yield predicted_entity, reference_entity
+
+
+# Same matrix the matchers give, from the alignments they make
+def alignments_to_correctness_matrix[T](
+    predicted: Iterable[T],
+    reference: Iterable[T],
+    alignments: Iterable[tuple[T, T]],
+) -> CorrectnessMatrix[T]:
+    aligned_predicted = set()
+    aligned_reference = set()
+    for predicted_item, reference_item in alignments:
+        aligned_predicted.add(predicted_item)
+        aligned_reference.add(reference_item)
+    return CorrectnessMatrix(
+        true_positives=aligned_predicted,
+        false_positives=set(predicted) - aligned_predicted,
+        false_negatives=set(reference) - aligned_reference,
+    )
+
+
+# Strict version of the matchers, each entity is paired with at most
+# one entity from the other side, so one long prediction over three
+# references is one true positive and two false negatives.  Of the
+# matcher's pairs, keeps those pairing up the most entities
+# and then sharing the most characters
+@timed("one_to_one_entity_matching")
+def one_to_one_entity_alignments(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    overlap: bool,
+) -> Sequence[tuple[Entity, Entity]]:
+    indexed_predictions = sorted(
+        predicted_entities, key=attrgetter("span", "label_studio_id")
+    )
+    indexed_references = sorted(
+        reference_entities, key=attrgetter("span", "label_studio_id")
+    )
+    prediction_to_index = {
+        prediction: index for index, prediction in enumerate(indexed_predictions)
+    }
+    reference_to_index = {
+        reference: index for index, reference in enumerate(indexed_references)
+    }
+    overlap_edges = [
+        (
+            prediction_to_index[prediction],
+            reference_to_index[reference],
+            overlap_length(prediction.span, reference.span),
+        )
+        for prediction, reference in entity_alignments(
+            indexed_predictions, indexed_references, overlap
+        )
+    ]
+    return [
+        (indexed_predictions[prediction_index], indexed_references[reference_index])
+        for prediction_index, reference_index in maximum_weight_matching(
+            cardinality_first_weights(overlap_edges)
+        )
+    ]
+
+
+def one_to_one_entity_correctness_matrix(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    overlap: bool,
+) -> CorrectnessMatrix:
+    return alignments_to_correctness_matrix(
+        predicted_entities,
+        reference_entities,
+        one_to_one_entity_alignments(predicted_entities, reference_entities, overlap),
+    )
+
+
 # Whether or not "None"s are considered
 # is left up to the user
 def build_relation_correctness_matrix(
     predicted_relations: Set[Relation],
     reference_relations: Set[Relation],
     overlap: bool,
+    brute_force: bool = False,
+    one_to_one: bool = False,
 ) -> CorrectnessMatrix:
+    if one_to_one:
+        return one_to_one_relation_correctness_matrix(
+            predicted_relations, reference_relations, overlap=overlap
+        )
     if not overlap:
         return exact_relation_correctness_matrix(
             predicted_relations, reference_relations
         )
+    if brute_force:
+        return brute_force_overlap_relation_correctness_matrix(
+            predicted_relations, reference_relations
+        )
     return overlap_relation_correctness_matrix(predicted_relations, reference_relations)
 
 
+@timed("exact_relation_matching")
 def exact_relation_correctness_matrix(
     predicted_relations: Set[Relation], reference_relations: Set[Relation]
 ) -> CorrectnessMatrix:
@@ -176,8 +339,206 @@ def exact_relation_correctness_matrix(
     )
 
 
+def get_relation_bucket(relation: Relation) -> tuple[tuple[str, ...], bool]:
+    # Relation.overlap_match never matches across
+    # labels or across directedness
+    return relation.label, relation.directed
+
+
+# Any reference relation which overlap matches a prediction
+# has an argument overlapping the prediction's arg1,
+# (arg1 itself if directed, one of the two if not)
+# so indexing both argument spans of each reference relation
+# and querying with the prediction's arg1 finds every plausible
+# candidate, then overlap_match makes the actual call
+@timed("overlap_relation_matching")
 def overlap_relation_correctness_matrix(
     predicted_relations: Collection[Relation], reference_relations: Collection[Relation]
+) -> CorrectnessMatrix:
+    indexed_predictions = list(predicted_relations)
+    indexed_references = list(reference_relations)
+    matched_prediction_indices, matched_reference_indices = map(
+        set,
+        unzip_alignments(
+            overlap_relation_alignments(indexed_predictions, indexed_references)
+        ),
+    )
+    true_positives = set()
+    false_positives = set()
+    for prediction_index, prediction in enumerate(indexed_predictions):
+        if prediction_index in matched_prediction_indices:
+            true_positives.add(prediction)
+        else:
+            false_positives.add(prediction)
+    false_negatives = {
+        reference
+        for reference_index, reference in enumerate(indexed_references)
+        if reference_index not in matched_reference_indices
+    }
+    return CorrectnessMatrix(
+        true_positives=true_positives,
+        false_positives=false_positives,
+        false_negatives=false_negatives,
+    )
+
+
+# Index of both argument spans of each relation, by bucket,
+# items being the relation's position in relations
+def build_relation_span_indices(
+    relations: Sequence[Relation],
+) -> Mapping[tuple[tuple[str, ...], bool], SpanIndex[int]]:
+    bucket_to_indices = defaultdict(list)
+    for index, relation in enumerate(relations):
+        bucket_to_indices[get_relation_bucket(relation)].append(index)
+    return {
+        bucket: build_span_index(
+            chain.from_iterable(
+                (
+                    (relations[index].arg1.span, index),
+                    (relations[index].arg2.span, index),
+                )
+                for index in indices
+            )
+        )
+        for bucket, indices in bucket_to_indices.items()
+    }
+
+
+# Yields every (prediction index, reference index) pair which overlap
+# match, reference_span_indices can be passed in when the same
+# references are matched against several predictions
+def overlap_relation_alignments(
+    predicted_relations: Sequence[Relation],
+    reference_relations: Sequence[Relation],
+    reference_span_indices: Mapping[tuple[tuple[str, ...], bool], SpanIndex[int]]
+    | None = None,
+) -> Iterator[tuple[int, int]]:
+    bucket_to_span_index = (
+        build_relation_span_indices(reference_relations)
+        if reference_span_indices is None
+        else reference_span_indices
+    )
+    total_comparisons = 0
+    for prediction_index, prediction in enumerate(predicted_relations):
+        span_index = bucket_to_span_index.get(get_relation_bucket(prediction))
+        if span_index is None:
+            continue
+        # Both arguments of an undirected reference can hit
+        candidate_indices = set(span_index.overlapping(prediction.arg1.span))
+        total_comparisons += len(candidate_indices)
+        for reference_index in candidate_indices:
+            if prediction.overlap_match(reference_relations[reference_index]):
+                yield prediction_index, reference_index
+    increment("overlap_comparisons", total_comparisons)
+
+
+# Characters shared by corresponding arguments, taking
+# the better correspondence for undirected relations
+def relation_overlap_length(first: Relation, second: Relation) -> int:
+    def paired_length(
+        first_span_1: tuple[int, int],
+        first_span_2: tuple[int, int],
+        second_span_1: tuple[int, int],
+        second_span_2: tuple[int, int],
+    ) -> int:
+        length_1 = overlap_length(first_span_1, second_span_1)
+        length_2 = overlap_length(first_span_2, second_span_2)
+        if length_1 <= 0 or length_2 <= 0:
+            return 0
+        return length_1 + length_2
+
+    straight_length = paired_length(
+        first.arg1.span, first.arg2.span, second.arg1.span, second.arg2.span
+    )
+    if first.directed:
+        return straight_length
+    return max(
+        straight_length,
+        paired_length(
+            first.arg1.span, first.arg2.span, second.arg2.span, second.arg1.span
+        ),
+    )
+
+
+# Relation version of one_to_one_entity_alignments
+@timed("one_to_one_relation_matching")
+def one_to_one_relation_alignments(
+    predicted_relations: Collection[Relation],
+    reference_relations: Collection[Relation],
+    overlap: bool,
+) -> Sequence[tuple[Relation, Relation]]:
+    indexed_predictions = sorted(
+        predicted_relations, key=attrgetter("arg1.span", "arg2.span", "label")
+    )
+    indexed_references = sorted(
+        reference_relations, key=attrgetter("arg1.span", "arg2.span", "label")
+    )
+    if overlap:
+        index_pairs = overlap_relation_alignments(
+            indexed_predictions, indexed_references
+        )
+    else:
+        key_to_reference_indices = defaultdict(list)
+        for reference_index, reference in enumerate(indexed_references):
+            key_to_reference_indices[reference.get_canonical_key()].append(
+                reference_index
+            )
+        index_pairs = (
+            (prediction_index, reference_index)
+            for prediction_index, prediction in enumerate(indexed_predictions)
+            for reference_index in key_to_reference_indices.get(
+                prediction.get_canonical_key(), ()
+            )
+        )
+    overlap_edges = [
+        (
+            prediction_index,
+            reference_index,
+            relation_overlap_length(
+                indexed_predictions[prediction_index],
+                indexed_references[reference_index],
+            ),
+        )
+        for prediction_index, reference_index in index_pairs
+    ]
+    return [
+        (indexed_predictions[prediction_index], indexed_references[reference_index])
+        for prediction_index, reference_index in maximum_weight_matching(
+            cardinality_first_weights(overlap_edges)
+        )
+    ]
+
+
+def one_to_one_relation_correctness_matrix(
+    predicted_relations: Collection[Relation],
+    reference_relations: Collection[Relation],
+    overlap: bool,
+) -> CorrectnessMatrix:
+    return alignments_to_correctness_matrix(
+        predicted_relations,
+        reference_relations,
+        one_to_one_relation_alignments(
+            predicted_relations, reference_relations, overlap
+        ),
+    )
+
+
+def unzip_alignments(
+    alignments: Iterable[tuple[int, int]],
+) -> tuple[Sequence[int], Sequence[int]]:
+    prediction_indices = []
+    reference_indices = []
+    for prediction_index, reference_index in alignments:
+        prediction_indices.append(prediction_index)
+        reference_indices.append(reference_index)
+    return prediction_indices, reference_indices
+
+
+# Original quadratic implementation, kept as a reference
+# for checking the indexed version
+@timed("overlap_relation_matching")
+def brute_force_overlap_relation_correctness_matrix(
+    predicted_relations: Collection[Relation], reference_relations: Collection[Relation]
 ) -> CorrectnessMatrix:
     true_positives = set()
     false_positives = set()
@@ -200,3 +561,253 @@ def overlap_relation_correctness_matrix(
         false_positives=false_positives,
         false_negatives=false_negatives,
     )
+
+
+def score_file_pair(
+    file_pair: tuple[AnnotatedFile | None, AnnotatedFile | None],
+    overlap: bool,
+) -> tuple[CorrectnessMatrix[Entity], CorrectnessMatrix[Relation]]:
+    predicted_file, reference_file = file_pair
+    predicted_entities = (
+        predicted_file.entities if predicted_file is not None else frozenset()
+    )
+    reference_entities = (
+        reference_file.entities if reference_file is not None else frozenset()
+    )
+    predicted_relations = (
+        predicted_file.relations if predicted_file is not None else frozenset()
+    )
+    reference_relations = (
+        reference_file.relations if reference_file is not None else frozenset()
+    )
+    return (
+        build_entity_correctness_matrix(
+            predicted_entities, reference_entities, overlap=overlap
+        ),
+        build_relation_correctness_matrix(
+            predicted_relations, reference_relations, overlap=overlap
+        ),
+    )
+
+
+# Counts only versions of the builders above for when
+# only the scores are needed, these only ever hash spans
+# and relation keys, never the Entity/Relation objects,
+# and the result can go straight into score_totals.
+# Inputs are assumed to be free of duplicates,
+# as the AnnotatedFile frozensets are
+@timed("entity_counting")
+def count_entity_correctness(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    overlap: bool,
+) -> Counter[Correctness]:
+    predicted_span_counts = Counter(map(attrgetter("span"), predicted_entities))
+    reference_span_counts = Counter(map(attrgetter("span"), reference_entities))
+    if overlap:
+        reference_index = build_span_index(
+            (span, span) for span in reference_span_counts.keys()
+        )
+        predicted_index = build_span_index(
+            (span, span) for span in predicted_span_counts.keys()
+        )
+
+        def is_true_positive(span: tuple[int, int]) -> bool:
+            return reference_index.overlaps_any(span)
+
+        def is_false_negative(span: tuple[int, int]) -> bool:
+            return not predicted_index.overlaps_any(span)
+
+    else:
+
+        def is_true_positive(span: tuple[int, int]) -> bool:
+            return span in reference_span_counts
+
+        def is_false_negative(span: tuple[int, int]) -> bool:
+            return span not in predicted_span_counts
+
+    correctness_totals = Counter(
+        {
+            Correctness.TRUE_POSITIVE: 0,
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: 0,
+            Correctness.FALSE_NEGATIVE: 0,
+        }
+    )
+    for span, count in predicted_span_counts.items():
+        if is_true_positive(span):
+            correctness_totals[Correctness.TRUE_POSITIVE] += count
+        else:
+            correctness_totals[Correctness.FALSE_POSITIVE] += count
+    for span, count in reference_span_counts.items():
+        if is_false_negative(span):
+            correctness_totals[Correctness.FALSE_NEGATIVE] += count
+    return correctness_totals
+
+
+@timed("relation_counting")
+def count_relation_correctness(
+    predicted_relations: Collection[Relation],
+    reference_relations: Collection[Relation],
+    overlap: bool,
+) -> Counter[Correctness]:
+    if overlap:
+        indexed_predictions = list(predicted_relations)
+        indexed_references = list(reference_relations)
+        matched_prediction_indices, matched_reference_indices = map(
+            set,
+            unzip_alignments(
+                overlap_relation_alignments(indexed_predictions, indexed_references)
+            ),
+        )
+        true_positives = len(matched_prediction_indices)
+        false_positives = len(indexed_predictions) - true_positives
+        false_negatives = len(indexed_references) - len(matched_reference_indices)
+    else:
+        predicted_keys = [
+            relation.get_canonical_key() for relation in predicted_relations
+        ]
+        reference_keys = [
+            relation.get_canonical_key() for relation in reference_relations
+        ]
+        predicted_key_set = set(predicted_keys)
+        reference_key_set = set(reference_keys)
+        true_positives = sum(1 for key in predicted_keys if key in reference_key_set)
+        false_positives = len(predicted_keys) - true_positives
+        false_negatives = sum(
+            1 for key in reference_keys if key not in predicted_key_set
+        )
+    return Counter(
+        {
+            Correctness.TRUE_POSITIVE: true_positives,
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: false_positives,
+            Correctness.FALSE_NEGATIVE: false_negatives,
+        }
+    )
+
+
+def pair_files_by_id(
+    predicted_corpus: SingleAnnotatorCorpus, reference_corpus: SingleAnnotatorCorpus
+) -> Mapping[int, tuple[AnnotatedFile | None, AnnotatedFile | None]]:
+    predicted_id_to_file = {
+        annotated_file.file_id: annotated_file
+        for annotated_file in predicted_corpus.annotated_files
+    }
+    reference_id_to_file = {
+        annotated_file.file_id: annotated_file
+        for annotated_file in reference_corpus.annotated_files
+    }
+    # Files only one annotator got to are still scored,
+    # all false positives or all false negatives
+    return {
+        file_id: (predicted_id_to_file.get(file_id), reference_id_to_file.get(file_id))
+        for file_id in sorted(predicted_id_to_file.keys() | reference_id_to_file.keys())
+    }
+
+
+# Scoring never matches across files so each file pair is scored
+# independently, over a process pool if max_workers != 1.  Serial
+# by default since starting the pool and pickling the files costs
+# more than it saves on small corpora, max_workers=None is one
+# worker per CPU.  Results come in file_id order whichever worker
+# finishes first, function must be picklable for the pool and
+# buffersize bounds how many results are in flight when streaming
+def map_file_pairs[P, R](
+    function: Callable[[P], R],
+    id_to_file_pair: Mapping[int, P],
+    max_workers: int | None,
+    chunksize: int = 16,
+    buffersize: int | None = None,
+) -> Iterator[R]:
+    if max_workers == 1:
+        yield from map(function, id_to_file_pair.values())
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(
+            function,
+            id_to_file_pair.values(),
+            chunksize=chunksize,
+            buffersize=buffersize,
+        )
+
+
+def score_corpus_files(
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_corpus: SingleAnnotatorCorpus,
+    overlap: bool,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> Mapping[int, tuple[CorrectnessMatrix[Entity], CorrectnessMatrix[Relation]]]:
+    id_to_file_pair = pair_files_by_id(predicted_corpus, reference_corpus)
+    return dict(
+        zip(
+            id_to_file_pair.keys(),
+            map_file_pairs(
+                partial(score_file_pair, overlap=overlap),
+                id_to_file_pair,
+                max_workers,
+                chunksize,
+            ),
+            strict=True,
+        )
+    )
+
+
+def score_corpora(
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_corpus: SingleAnnotatorCorpus,
+    overlap: bool,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> tuple[CorrectnessMatrix[Entity], CorrectnessMatrix[Relation]]:
+    file_id_to_matrices = score_corpus_files(
+        predicted_corpus=predicted_corpus,
+        reference_corpus=reference_corpus,
+        overlap=overlap,
+        max_workers=max_workers,
+        chunksize=chunksize,
+    )
+    return (
+        merge_correctness_matrices(map(itemgetter(0), file_id_to_matrices.values())),
+        merge_correctness_matrices(map(itemgetter(1), file_id_to_matrices.values())),
+    )
+
+
+def count_file_pair(
+    file_pair: tuple[AnnotatedFile | None, AnnotatedFile | None],
+    overlap: bool,
+) -> tuple[Counter[Correctness], Counter[Correctness]]:
+    predicted_file, reference_file = file_pair
+    return (
+        count_entity_correctness(
+            predicted_file.entities if predicted_file is not None else frozenset(),
+            reference_file.entities if reference_file is not None else frozenset(),
+            overlap=overlap,
+        ),
+        count_relation_correctness(
+            predicted_file.relations if predicted_file is not None else frozenset(),
+            reference_file.relations if reference_file is not None else frozenset(),
+            overlap=overlap,
+        ),
+    )
+
+
+def count_corpora(
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_corpus: SingleAnnotatorCorpus,
+    overlap: bool,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> tuple[Counter[Correctness], Counter[Correctness]]:
+    entity_totals = Counter()
+    relation_totals = Counter()
+    for entity_counts, relation_counts in map_file_pairs(
+        partial(count_file_pair, overlap=overlap),
+        pair_files_by_id(predicted_corpus, reference_corpus),
+        max_workers,
+        chunksize,
+    ):
+        entity_totals.update(entity_counts)
+        relation_totals.update(relation_counts)
+    return entity_totals, relation_totals
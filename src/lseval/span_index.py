@@ -0,0 +1,54 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from itertools import accumulate
+from operator import itemgetter
+
+
+# Static index over half-open character spans, the same
+# convention as Entity.span.  Spans are kept sorted by start
+# with a running maximum of the ends, so "does anything overlap
+# this span" is a single bisect rather than a scan over every
+# span in the file.
+@dataclass(frozen=True)
+class SpanIndex[T]:
+    starts: Sequence[int] = field(default_factory=tuple)
+    ends: Sequence[int] = field(default_factory=tuple)
+    prefix_max_ends: Sequence[int] = field(default_factory=tuple)
+    items: Sequence[T] = field(default_factory=tuple)
+    max_length: int = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def overlaps_any(self, span: tuple[int, int]) -> bool:
+        # Everything left of cutoff starts before span ends,
+        # so it's an overlap iff one of them ends after span starts
+        cutoff = bisect_left(self.starts, span[1])
+        return cutoff > 0 and self.prefix_max_ends[cutoff - 1] > span[0]
+
+    def overlapping(self, span: tuple[int, int]) -> Iterator[T]:
+        # Nothing is longer than max_length so nothing starting
+        # at or before span[0] - max_length can reach span
+        lower = bisect_right(self.starts, span[0] - self.max_length)
+        upper = bisect_left(self.starts, span[1])
+        for index in range(lower, upper):
+            if self.ends[index] > span[0]:
+                yield self.items[index]
+
+
+def build_span_index[T](
+    spanned_items: Iterable[tuple[tuple[int, int], T]],
+) -> SpanIndex[T]:
+    sorted_spanned_items = sorted(spanned_items, key=itemgetter(0))
+    starts = tuple(span[0] for span, _ in sorted_spanned_items)
+    ends = tuple(span[1] for span, _ in sorted_spanned_items)
+    return SpanIndex(
+        starts=starts,
+        ends=ends,
+        prefix_max_ends=tuple(accumulate(ends, max)),
+        items=tuple(item for _, item in sorted_spanned_items),
+        max_length=max(
+            (end - start for start, end in zip(starts, ends, strict=True)), default=0
+        ),
+    )
@@ -0,0 +1,223 @@
+from collections import Counter
+from collections.abc import Callable, Collection, Iterable, Sequence
+from dataclasses import dataclass
+from functools import partial
+
+import numpy as np
+
+from .bootstrap import array_scores
+from .datatypes import (
+    AnnotatedFile,
+    Entity,
+    Relation,
+    SingleAnnotatorCorpus,
+    overlap_length,
+)
+from .score import map_file_pairs, overlap_relation_alignments, pair_files_by_id
+from .span_index import build_span_index
+
+
+def span_intersection(first_span: tuple[int, int], second_span: tuple[int, int]) -> int:
+    return max(0, overlap_length(first_span, second_span))
+
+
+def jaccard_ratio(first_span: tuple[int, int], second_span: tuple[int, int]) -> float:
+    intersection = span_intersection(first_span, second_span)
+    union = (
+        (first_span[1] - first_span[0])
+        + (second_span[1] - second_span[0])
+        - intersection
+    )
+    return intersection / union
+
+
+def dice_ratio(first_span: tuple[int, int], second_span: tuple[int, int]) -> float:
+    intersection = span_intersection(first_span, second_span)
+    return (2 * intersection) / (
+        (first_span[1] - first_span[0]) + (second_span[1] - second_span[0])
+    )
+
+
+# Each entity's best overlap ratio against any entity on the other
+# side, 0 if it overlaps none.  Whether an entity counts at threshold t
+# only depends on this, so one sweep covers every threshold
+def entity_best_ratios(
+    predicted_entities: Collection[Entity],
+    reference_entities: Collection[Entity],
+    ratio: Callable[[tuple[int, int], tuple[int, int]], float] = jaccard_ratio,
+) -> tuple[np.ndarray, np.ndarray]:
+    predicted_span_counts = Counter(entity.span for entity in predicted_entities)
+    reference_span_counts = Counter(entity.span for entity in reference_entities)
+    reference_index = build_span_index(
+        (span, span) for span in reference_span_counts.keys()
+    )
+    predicted_span_ratios = {span: 0.0 for span in predicted_span_counts.keys()}
+    reference_span_ratios = {span: 0.0 for span in reference_span_counts.keys()}
+    for predicted_span in predicted_span_counts.keys():
+        for reference_span in reference_index.overlapping(predicted_span):
+            span_ratio = ratio(predicted_span, reference_span)
+            if span_ratio > predicted_span_ratios[predicted_span]:
+                predicted_span_ratios[predicted_span] = span_ratio
+            if span_ratio > reference_span_ratios[reference_span]:
+                reference_span_ratios[reference_span] = span_ratio
+    return (
+        np.repeat(
+            np.fromiter(predicted_span_ratios.values(), dtype=np.float64),
+            np.fromiter(predicted_span_counts.values(), dtype=np.int64),
+        ),
+        np.repeat(
+            np.fromiter(reference_span_ratios.values(), dtype=np.float64),
+            np.fromiter(reference_span_counts.values(), dtype=np.int64),
+        ),
+    )
+
+
+# A relation pair is only as good as its worse argument pair,
+# under the better correspondence for undirected relations
+def relation_ratio(
+    first: Relation,
+    second: Relation,
+    ratio: Callable[[tuple[int, int], tuple[int, int]], float],
+) -> float:
+    straight_ratio = min(
+        ratio(first.arg1.span, second.arg1.span),
+        ratio(first.arg2.span, second.arg2.span),
+    )
+    if first.directed:
+        return straight_ratio
+    return max(
+        straight_ratio,
+        min(
+            ratio(first.arg1.span, second.arg2.span),
+            ratio(first.arg2.span, second.arg1.span),
+        ),
+    )
+
+
+def relation_best_ratios(
+    predicted_relations: Collection[Relation],
+    reference_relations: Collection[Relation],
+    ratio: Callable[[tuple[int, int], tuple[int, int]], float] = jaccard_ratio,
+) -> tuple[np.ndarray, np.ndarray]:
+    indexed_predictions = list(predicted_relations)
+    indexed_references = list(reference_relations)
+    predicted_ratios = np.zeros(len(indexed_predictions))
+    reference_ratios = np.zeros(len(indexed_references))
+    for prediction_index, reference_index in overlap_relation_alignments(
+        indexed_predictions, indexed_references
+    ):
+        pair_ratio = relation_ratio(
+            indexed_predictions[prediction_index],
+            indexed_references[reference_index],
+            ratio,
+        )
+        predicted_ratios[prediction_index] = max(
+            predicted_ratios[prediction_index], pair_ratio
+        )
+        reference_ratios[reference_index] = max(
+            reference_ratios[reference_index], pair_ratio
+        )
+    return predicted_ratios, reference_ratios
+
+
+# Tallies at each threshold, a prediction is a true positive at t if
+# some reference overlaps it with ratio at least t, a reference is a
+# false negative if no prediction does.  t = 0 is the usual overlap
+# scoring (any shared character) and t = 1 exact scoring
+@dataclass(frozen=True)
+class ThresholdCurve:
+    thresholds: np.ndarray
+    true_positives: np.ndarray
+    false_positives: np.ndarray
+    false_negatives: np.ndarray
+
+    # (f1, precision, recall) arrays over the thresholds
+    def get_scores(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return array_scores(
+            np.stack(
+                (self.true_positives, self.false_positives, self.false_negatives),
+                axis=-1,
+            )
+        )
+
+
+def build_threshold_curve(
+    predicted_ratios: np.ndarray,
+    reference_ratios: np.ndarray,
+    thresholds: Sequence[float] | np.ndarray = np.linspace(0.0, 1.0, 21),
+) -> ThresholdCurve:
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    # 0 means no overlap at all, never a match
+    # even at a threshold of 0
+    effective_thresholds = np.maximum(thresholds, np.nextafter(0.0, 1.0))
+    sorted_predicted_ratios = np.sort(predicted_ratios)
+    sorted_reference_ratios = np.sort(reference_ratios)
+    true_positives = len(sorted_predicted_ratios) - np.searchsorted(
+        sorted_predicted_ratios, effective_thresholds, side="left"
+    )
+    false_negatives = np.searchsorted(
+        sorted_reference_ratios, effective_thresholds, side="left"
+    )
+    return ThresholdCurve(
+        thresholds=thresholds,
+        true_positives=true_positives,
+        false_positives=len(sorted_predicted_ratios) - true_positives,
+        false_negatives=false_negatives,
+    )
+
+
+def file_pair_best_ratios(
+    file_pair: tuple[AnnotatedFile | None, AnnotatedFile | None],
+    ratio: Callable[[tuple[int, int], tuple[int, int]], float] = jaccard_ratio,
+) -> tuple[tuple[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]:
+    predicted_file, reference_file = file_pair
+    return (
+        entity_best_ratios(
+            predicted_file.entities if predicted_file is not None else frozenset(),
+            reference_file.entities if reference_file is not None else frozenset(),
+            ratio=ratio,
+        ),
+        relation_best_ratios(
+            predicted_file.relations if predicted_file is not None else frozenset(),
+            reference_file.relations if reference_file is not None else frozenset(),
+            ratio=ratio,
+        ),
+    )
+
+
+def concatenate_ratios(
+    ratio_pairs: Iterable[tuple[np.ndarray, np.ndarray]],
+) -> tuple[np.ndarray, np.ndarray]:
+    predicted_ratios, reference_ratios = zip(*ratio_pairs, strict=True)
+    return np.concatenate(predicted_ratios), np.concatenate(reference_ratios)
+
+
+# Entity and relation curves for the whole corpus from one scoring pass,
+# ratio must be picklable (e.g. a module level function) with a process pool
+def corpus_threshold_curves(
+    predicted_corpus: SingleAnnotatorCorpus,
+    reference_corpus: SingleAnnotatorCorpus,
+    thresholds: Sequence[float] | np.ndarray = np.linspace(0.0, 1.0, 21),
+    ratio: Callable[[tuple[int, int], tuple[int, int]], float] = jaccard_ratio,
+    max_workers: int | None = 1,
+    chunksize: int = 16,
+) -> tuple[ThresholdCurve, ThresholdCurve]:
+    file_ratios = list(
+        map_file_pairs(
+            partial(file_pair_best_ratios, ratio=ratio),
+            pair_files_by_id(predicted_corpus, reference_corpus),
+            max_workers,
+            chunksize,
+        )
+    )
+    empty_ratios = (np.empty(0), np.empty(0))
+    entity_ratios = concatenate_ratios(
+        [empty_ratios, *(entity_ratios for entity_ratios, _ in file_ratios)]
+    )
+    relation_ratios = concatenate_ratios(
+        [empty_ratios, *(relation_ratios for _, relation_ratios in file_ratios)]
+    )
+    return (
+        build_threshold_curve(*entity_ratios, thresholds=thresholds),
+        build_threshold_curve(*relation_ratios, thresholds=thresholds),
+    )
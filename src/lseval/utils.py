@@ -1,11 +1,21 @@
+import io
 import json
 import logging
-import operator
+import warnings
 from collections import defaultdict, deque
-from collections.abc import Collection, Container, Iterable, Mapping, Sequence
+from collections.abc import (
+    Collection,
+    Container,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
+from dataclasses import replace
 from functools import partial
-from operator import itemgetter
-from typing import cast
+from itertools import chain
+from os import PathLike
+from typing import BinaryIO, TextIO, cast
 
 from more_itertools import all_equal, map_reduce, partition
 
@@ -15,6 +25,17 @@ from .datatypes import (
     Entity,
     Relation,
     SingleAnnotatorCorpus,
+    SourceAnnotation,
+)
+from .instrumentation import increment, timed
+from .schema import (
+    DEFAULT_SCHEMA,
+    CompiledSchema,
+    TagDecoder,
+    decode_cuis,
+    decode_dtr,
+    decode_label,
+    decode_text,
 )
 
 logger = logging.getLogger(__name__)
@@ -26,59 +47,227 @@ logging.basicConfig(
 )
 
 
-CORE_ATTRIBUTES = {"DocTimeRel", "CUI", "Event"}
+# CORE_ATTRIBUTES is deprecated along with the attributes argument of
+# coordinate_attribute_entities_to_single, it's the from_names of
+# DEFAULT_SCHEMA and passing it there is the same as not passing it
+def __getattr__(name: str) -> frozenset[str]:
+    if name == "CORE_ATTRIBUTES":
+        warnings.warn(
+            "CORE_ATTRIBUTES is deprecated, use DEFAULT_SCHEMA.from_name_to_decoder",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return frozenset(DEFAULT_SCHEMA.from_name_to_decoder)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Bump whenever a change here changes the parsed output,
+# it invalidates corpus_cache entries and incremental scores
+PARSER_VERSION = 1
 
 
 def parse_dtr(entity: dict) -> DocTimeRel:
     if entity.get("from_name") != "DocTimeRel":
         raise ValueError(f"Wrong entity type for parse_dtr: {entity['from_name']}")
-    entity_value = entity.get("value")
-    if entity_value is None:
-        raise ValueError(f"Missing value field for DTR entity: {entity}")
-    dtr_choices = entity_value.get("choices", [])
-    if len(dtr_choices) != 1:
-        raise ValueError(f"Invalid values for DTR choices: {dtr_choices}")
-    # Don't worry there's a _missing_ method
-    return DocTimeRel(dtr_choices[0])
+    return decode_dtr(entity)
 
 
 def parse_cuis(entity: dict) -> tuple[str, ...]:
     if entity.get("from_name") != "CUI":
         raise ValueError(f"Wrong entity type for parse_cuis: {entity['from_name']}")
-    entity_value = entity.get("value")
-    if entity_value is None:
-        raise ValueError(f"Missing value field for CUIS entity: {entity}")
-    return tuple(
-        sorted(
-            map(
-                str.upper,
-                map(
-                    str.strip,
-                    filter(operator.is_not_none, entity_value.get("text", [])),
-                ),
-            )
-        )
-    )
+    return decode_cuis(entity)
 
 
 def parse_text(entity: dict) -> str | None:
     if entity.get("from_name") != "DocTimeRel" and entity.get("from_name") != "Event":
         entity_space = entity["from_name"]
         raise ValueError(f"Wrong entity type for parse_text: {entity_space}")
-    entity_value = entity.get("value")
-    if entity_value is None:
-        raise ValueError(f"Missing value field for DTR/Event entity: {entity}")
-    return entity_value.get("text", [])
+    return decode_text(entity)
+
+
+# Lazily yields task dictionaries from a Label Studio JSON array
+# export or JSONL (one task per line), from a path or a binary stream.
+# If jsonl is None the format is inferred from the first non-whitespace
+# character.  Only one task is decoded at a time so this can be passed
+# straight to organize_corpus_annotations_by_annotator without
+# json.load-ing the whole export first
+def read_label_studio_export(
+    export: str | PathLike | BinaryIO,
+    jsonl: bool | None = None,
+    chunk_size: int = 1 << 16,
+) -> Iterator[dict]:
+    if isinstance(export, (str, PathLike)):
+        with open(export, "rb") as export_stream:
+            yield from read_label_studio_export(export_stream, jsonl, chunk_size)
+        return
+    text_stream = io.TextIOWrapper(export, encoding="utf-8")
+    try:
+        buffer = text_stream.read(chunk_size)
+        first_non_whitespace = buffer.lstrip()[:1]
+        while first_non_whitespace == "" and len(buffer) > 0:
+            buffer = text_stream.read(chunk_size)
+            first_non_whitespace = buffer.lstrip()[:1]
+        if jsonl is None:
+            jsonl = first_non_whitespace != "["
+        if jsonl:
+            yield from stream_jsonl_tasks(chain((buffer,), text_stream))
+        else:
+            yield from stream_json_array_tasks(buffer, text_stream, chunk_size)
+    finally:
+        # Otherwise closing the wrapper closes the caller's stream
+        text_stream.detach()
+
+
+def stream_jsonl_tasks(lines: Iterable[str]) -> Iterator[dict]:
+    # First "line" is the leftover of the format sniffing read,
+    # split it back up so it behaves like the rest
+    def split_lines(lines: Iterable[str]) -> Iterator[str]:
+        partial_line = ""
+        for chunk in lines:
+            *complete_lines, partial_line = (partial_line + chunk).split("\n")
+            yield from complete_lines
+        yield partial_line
+
+    for line_number, line in enumerate(split_lines(lines), start=1):
+        if len(line.strip()) == 0:
+            continue
+        task = json.loads(line)
+        if not isinstance(task, dict):
+            raise ValueError(f"Line {line_number} is not a task object: {type(task)}")
+        yield task
+
+
+def stream_json_array_tasks(
+    buffer: str, text_stream: TextIO, chunk_size: int
+) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    exhausted = False
+
+    def skip_whitespace(position: int) -> int:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        return position
+
+    # Drops what's been decoded along with reading the next chunk, so
+    # memory stays bounded by a chunk or one task without copying the
+    # rest of the buffer after every task.  Returns the new position
+    def fill(position: int, minimum: int) -> int:
+        nonlocal buffer, exhausted
+        # Grow geometrically so a single large task doesn't
+        # get re-decoded once per chunk
+        chunk = text_stream.read(max(chunk_size, minimum))
+        if len(chunk) == 0:
+            exhausted = True
+        buffer = buffer[position:] + chunk
+        return 0
+
+    position = skip_whitespace(0)
+    if buffer[position : position + 1] != "[":
+        raise ValueError("Label Studio JSON export should be an array of tasks")
+    position += 1
+    expecting_task = True
+    empty = True
+    while True:
+        position = skip_whitespace(position)
+        if position == len(buffer):
+            if exhausted:
+                raise ValueError("Label Studio JSON export ended mid array")
+            position = fill(position, chunk_size)
+            continue
+        match buffer[position]:
+            case "]" if expecting_task and not empty:
+                raise ValueError("Trailing comma after the last task")
+            case "]":
+                return
+            case "," if not expecting_task:
+                position += 1
+                expecting_task = True
+                continue
+            case unexpected if not expecting_task:
+                raise ValueError(f"Expected , or ] between tasks, found {unexpected}")
+        try:
+            task, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            position = fill(position, len(buffer) - position)
+            continue
+        if not isinstance(task, dict):
+            raise ValueError(f"Export array contains a non-task value: {type(task)}")
+        yield task
+        position = end
+        expecting_task = False
+        empty = False
+
+
+# Counterpart to read_label_studio_export, writes tasks as they come
+# as a JSON array (Label Studio import format) or JSONL.
+# Returns the number of tasks written
+def write_label_studio_tasks(
+    tasks: Iterable[dict],
+    output: str | PathLike | TextIO,
+    jsonl: bool = False,
+) -> int:
+    if isinstance(output, (str, PathLike)):
+        with open(output, "w", encoding="utf-8") as output_stream:
+            return write_label_studio_tasks(tasks, output_stream, jsonl)
+    total_tasks = 0
+    if jsonl:
+        for task in tasks:
+            output.write(json.dumps(task))
+            output.write("\n")
+            total_tasks += 1
+        return total_tasks
+    output.write("[")
+    for task in tasks:
+        if total_tasks > 0:
+            output.write(",")
+        output.write("\n")
+        output.write(json.dumps(task))
+        total_tasks += 1
+    output.write("\n]\n")
+    return total_tasks
+
+
+# IDs whose annotation sets needn't be parsed at all, the ignored
+# ones and, given annotators_to_keep (e.g. just the reference and
+# prediction annotators), those mapped to any other annotator.
+# IDs missing from the mapping aren't skipped so they still fail
+# in organize_file_annotations_by_annotator as before
+def get_annotator_ids_to_skip[T](
+    id_to_unique_annotator: Mapping[int, T],
+    annotator_ids_to_ignore: Iterable[int],
+    annotators_to_keep: Collection[T] | None = None,
+) -> frozenset[int]:
+    if annotators_to_keep is None:
+        return frozenset(annotator_ids_to_ignore)
+    return frozenset(
+        chain(
+            annotator_ids_to_ignore,
+            (
+                annotator_id
+                for annotator_id, annotator in id_to_unique_annotator.items()
+                if annotator not in annotators_to_keep
+            ),
+        )
+    )
 
 
 def organize_corpus_annotations_by_annotator[T](
     raw_json_corpus: Iterable[dict],
     id_to_unique_annotator: Mapping[int, T],
     annotator_ids_to_ignore: Sequence[int],
+    schema: CompiledSchema = DEFAULT_SCHEMA,
+    annotators_to_keep: Collection[T] | None = None,
 ) -> Mapping[T, SingleAnnotatorCorpus]:
+    annotator_ids_to_skip = get_annotator_ids_to_skip(
+        id_to_unique_annotator, annotator_ids_to_ignore, annotators_to_keep
+    )
     annotator_to_files = defaultdict(deque)
     for raw_file_dictionary in raw_json_corpus:
-        annotator_id_to_file = organize_file_by_annotator_id(raw_file_dictionary)
+        annotator_id_to_file = organize_file_by_annotator_id(
+            raw_file_dictionary, schema, annotator_ids_to_skip
+        )
         annotator_merged_file_dictionary = organize_file_annotations_by_annotator(
             annotator_id_to_file, id_to_unique_annotator, annotator_ids_to_ignore
         )
@@ -111,31 +300,44 @@ def organize_file_annotations_by_annotator[T](
     return merged
 
 
+@timed("parsing")
 def organize_file_by_annotator_id(
     raw_file_dictionary: dict,
+    schema: CompiledSchema = DEFAULT_SCHEMA,
+    annotator_ids_to_skip: Container[int] = frozenset(),
 ) -> Mapping[int, AnnotatedFile]:
+    increment("tasks_parsed")
     file_id = int(raw_file_dictionary["id"])
     id_annotations_ls = raw_file_dictionary["annotations"]
 
-    return {
-        annotations["completed_by"]: id_annotations_to_file(
-            file_id, annotations["result"], raw_file_dictionary["data"]["text"]
+    annotator_id_to_file = {}
+    for annotations in id_annotations_ls:
+        # Filtered on completed_by before any of the set is parsed
+        if annotations["completed_by"] in annotator_ids_to_skip:
+            increment("annotation_sets_skipped")
+            continue
+        annotator_id_to_file[annotations["completed_by"]] = id_annotations_to_file(
+            file_id, annotations["result"], raw_file_dictionary["data"]["text"], schema
         )
-        for annotations in id_annotations_ls
-    }
+    return annotator_id_to_file
 
 
 def id_annotations_to_file(
-    file_id: int, id_annotations: Iterable[dict], file_text: str
+    file_id: int,
+    id_annotations: Iterable[dict],
+    file_text: str,
+    schema: CompiledSchema = DEFAULT_SCHEMA,
 ) -> AnnotatedFile:
     def is_relation(annotation: dict) -> bool:
         return annotation["type"] == "relation"
 
     entity_iter, relation_iter = partition(is_relation, id_annotations)
-    ann_id_to_entity = organize_entities_by_ann_id(file_id, entity_iter)
+    ann_id_to_entity = organize_entities_by_ann_id(file_id, entity_iter, schema)
     linked_relations = frozenset(
         parse_and_coordinate_relations(file_id, relation_iter, ann_id_to_entity)
     )
+    increment("entities_built", len(ann_id_to_entity))
+    increment("relations_built", len(linked_relations))
     return AnnotatedFile(
         file_id=file_id,
         file_text=file_text,
@@ -149,6 +351,7 @@ def id_annotations_to_file(
 def organize_entities_by_ann_id(
     file_id: int,
     entity_annotations: Iterable[dict],
+    schema: CompiledSchema = DEFAULT_SCHEMA,
 ) -> Mapping[str, Entity]:
     def get_annotation_id(entity_annotation: dict) -> str:
         annotation_id = entity_annotation.get("id")
@@ -156,7 +359,9 @@ def organize_entities_by_ann_id(
             raise ValueError(f"Entity: {entity_annotation} is missing id")
         return cast(str, annotation_id)
 
-    coordindate_to_single = partial(coordinate_attribute_entities_to_single, file_id)
+    coordindate_to_single = partial(
+        coordinate_attribute_entities_to_single, file_id, schema=schema
+    )
     return {
         annotation_id: entity
         for annotation_id, entity in map_reduce(
@@ -180,50 +385,74 @@ def parse_event_type(entity: dict) -> str | None:
     if entity.get("from_name") != "Event":
         entity_space = entity["from_name"]
         raise ValueError(f"Wrong entity type for parse_event_type: {entity_space}")
-    entity_value = entity.get("value")
-    if entity_value is None:
-        raise ValueError(f"Missing value field for event type entity: {entity}")
-    event_type_labels = entity_value.get("labels", [])
-    if len(event_type_labels) != 1:
-        raise ValueError(f"Invalid values for event type labels: {event_type_labels}")
-    # Don't worry there's a _missing_ method
-    return str(event_type_labels[0])
+    return decode_label(entity)
 
 
+# Annotations of one region, merged through the schema's decoder
+# table, each Entity field is decoded from the first tag mapped to it.
+# attributes is deprecated, it limits the from_names considered,
+# which is now done by compiling a schema with only those tags
 def coordinate_attribute_entities_to_single(
-    file_id: int, entities: Sequence[dict], attributes: Container[str] = CORE_ATTRIBUTES
+    file_id: int,
+    entities: Sequence[dict],
+    attributes: Container[str] | None = None,
+    schema: CompiledSchema = DEFAULT_SCHEMA,
 ) -> Entity | None:
-    def get_first(entities: Sequence[dict]) -> dict:
-        if len(entities) > 1:
+    if attributes is not None:
+        warnings.warn(
+            "attributes is deprecated, pass a CompiledSchema as schema instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        schema = replace(
+            schema,
+            from_name_to_decoder={
+                from_name: decoder
+                for from_name, decoder in schema.from_name_to_decoder.items()
+                if from_name in attributes
+            },
+        )
+
+    def get_first(
+        decoded_entities: Sequence[tuple[TagDecoder, dict]],
+    ) -> tuple[TagDecoder, dict]:
+        if len(decoded_entities) > 1:
             logger.error(
                 "%d entities with id %s sharing type %s",
-                len(entities),
-                entities[0]["id"],
-                entities[0]["from_name"],
+                len(decoded_entities),
+                decoded_entities[0][1]["id"],
+                decoded_entities[0][0].entity_field,
             )
-        return entities[0]
-
-    entity_attribute_to_instances = map_reduce(
-        (entity for entity in entities if entity["from_name"] in attributes),
-        keyfunc=itemgetter("from_name"),
+        return decoded_entities[0]
+
+    field_to_decoded = map_reduce(
+        (
+            (decoder, entity)
+            for entity in entities
+            if (decoder := schema.get_decoder(entity["from_name"])) is not None
+        ),
+        keyfunc=lambda decoded: decoded[0].entity_field,
         reducefunc=get_first,
     )
 
     if not all_equal(map(get_indices, entities)):
         raise ValueError(f"Entities not matching on indices {entities}")
 
-    raw_event = entity_attribute_to_instances.get("Event")
-    raw_dtr = entity_attribute_to_instances.get("DocTimeRel")
-    raw_cuis = entity_attribute_to_instances.get("CUI")
+    field_to_value = {
+        entity_field: decoder.decode(entity)
+        for entity_field, (decoder, entity) in field_to_decoded.items()
+    }
+    # The covered text comes with the label
+    raw_label = field_to_decoded.get("label")
     return Entity(
         file_id=file_id,
         label_studio_id=entities[0]["id"],
         span=get_indices(entity=entities[0]),
-        text=parse_text(raw_event) if raw_event is not None else None,
-        dtr=parse_dtr(raw_dtr) if raw_dtr is not None else None,
-        label=parse_event_type(raw_event) if raw_event is not None else None,
-        cuis=parse_cuis(raw_cuis) if raw_cuis is not None else (),
-        source_annotations=tuple(json.dumps(entity) for entity in entities),
+        text=decode_text(raw_label[1]) if raw_label is not None else None,
+        dtr=field_to_value.get("dtr"),
+        label=field_to_value.get("label"),
+        cuis=field_to_value.get("cuis", ()),
+        source_annotations=tuple(map(SourceAnnotation.from_dict, entities)),
     )
 
 
@@ -244,7 +473,7 @@ def parse_and_coordinate_relations(
             arg1=ann_id_to_entity[annotation["from_id"]],
             arg2=ann_id_to_entity[annotation["to_id"]],
             label=label,
-            source_annotations=(json.dumps(annotation),),
+            source_annotations=(SourceAnnotation.from_dict(annotation),),
         )
 
     for annotation in relation_annotations:
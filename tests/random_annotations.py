@@ -0,0 +1,170 @@
+import random
+
+from lseval.datatypes import AnnotatedFile, Entity, Relation, SingleAnnotatorCorpus
+
+# Small random files for checking the fast scoring paths against the
+# brute force ones.  Spans are drawn from a short text so overlaps,
+# shared spans and exact matches all come up often
+
+LABELS = ("Event", "Signature", "Dose")
+RELATION_LABELS = ("Probable", "Possible")
+
+
+def random_span(rng: random.Random, text_length: int = 60) -> tuple[int, int]:
+    start = rng.randrange(text_length - 1)
+    return start, rng.randint(start + 1, min(text_length, start + 8))
+
+
+def random_entities(
+    rng: random.Random, file_id: int, total: int, prefix: str
+) -> frozenset[Entity]:
+    return frozenset(
+        Entity(
+            file_id=file_id,
+            label_studio_id=f"{prefix}{index}",
+            span=random_span(rng),
+            text=None,
+            dtr=None,
+            label=rng.choice(LABELS),
+            cuis=(),
+            source_annotations=(),
+        )
+        for index in range(total)
+    )
+
+
+def random_relations(
+    rng: random.Random, entities: frozenset[Entity], total: int
+) -> frozenset[Relation]:
+    ordered_entities = sorted(entities, key=lambda entity: entity.label_studio_id)
+    if len(ordered_entities) < 2:
+        return frozenset()
+    return frozenset(
+        Relation(
+            file_id=ordered_entities[0].file_id,
+            arg1=arg1,
+            arg2=arg2,
+            label=(rng.choice(RELATION_LABELS),),
+            source_annotations=(),
+            directed=rng.random() < 0.3,
+        )
+        for arg1, arg2 in (rng.sample(ordered_entities, 2) for _ in range(total))
+    )
+
+
+def random_file(rng: random.Random, file_id: int, prefix: str) -> AnnotatedFile:
+    entities = random_entities(rng, file_id, rng.randint(0, 12), prefix)
+    return AnnotatedFile(
+        file_id=file_id,
+        file_text="x" * 60,
+        entities=entities,
+        relations=random_relations(rng, entities, rng.randint(0, 8)),
+    )
+
+
+# Some files only one side annotated
+def random_corpora(
+    rng: random.Random, total_files: int = 20
+) -> tuple[SingleAnnotatorCorpus, SingleAnnotatorCorpus]:
+    predicted_files = []
+    reference_files = []
+    for file_id in range(total_files):
+        if rng.random() < 0.9:
+            predicted_files.append(random_file(rng, file_id, "p"))
+        if rng.random() < 0.9:
+            reference_files.append(random_file(rng, file_id, "r"))
+    return (
+        SingleAnnotatorCorpus(annotated_files=frozenset(predicted_files)),
+        SingleAnnotatorCorpus(annotated_files=frozenset(reference_files)),
+    )
+
+
+def random_region(
+    rng: random.Random, region_id: str, span: tuple[int, int], text: str
+) -> list[dict]:
+    start, end = span
+    value = {"start": start, "end": end, "text": text[start:end]}
+    from_name, label = rng.choice(
+        (
+            ("Event", "Adverse Event"),
+            ("Event", "Radiotherapy Treatment"),
+            ("RadiotherapySignature", "Site"),
+        )
+    )
+    region = [
+        {
+            "id": region_id,
+            "from_name": from_name,
+            "to_name": "text",
+            "type": "labels",
+            "value": {**value, "labels": [label]},
+        }
+    ]
+    if rng.random() < 0.5:
+        region.append(
+            {
+                "id": region_id,
+                "from_name": "DocTimeRel",
+                "to_name": "text",
+                "type": "choices",
+                "value": {**value, "choices": [rng.choice(("BEFORE", "AFTER"))]},
+            }
+        )
+    if rng.random() < 0.5:
+        region.append(
+            {
+                "id": region_id,
+                "from_name": "CUI",
+                "to_name": "text",
+                "type": "textarea",
+                "value": {**value, "text": [rng.choice(("C0001", "c0002"))]},
+            }
+        )
+    return region
+
+
+# Raw Label Studio tasks as exported, every annotator starts from the
+# same regions (so region IDs are shared, as with preannotations) and
+# drops or nudges some
+def random_tasks(
+    rng: random.Random, total_tasks: int, annotator_ids: tuple[int, ...] = (1, 2)
+) -> list[dict]:
+    tasks = []
+    for task_id in range(total_tasks):
+        text = "".join(rng.choices("abc ", k=80))
+        # Regions don't overlap each other, only the nudged copies of
+        # the same region do
+        spans = [
+            (start, start + rng.randint(1, 8))
+            for start in rng.sample(range(0, len(text), 10), rng.randint(0, 8))
+        ]
+        annotations = []
+        for annotator_id in annotator_ids:
+            result = []
+            region_ids = []
+            for index, (start, end) in enumerate(spans):
+                if rng.random() < 0.2:
+                    continue
+                if rng.random() < 0.3:
+                    end = min(len(text), end + 1)
+                region_id = f"{task_id}-{index}"
+                region_ids.append(region_id)
+                result.extend(random_region(rng, region_id, (start, end), text))
+            if len(region_ids) >= 2:
+                for from_id, to_id in dict.fromkeys(
+                    tuple(rng.sample(region_ids, 2)) for _ in range(3)
+                ):
+                    result.append(
+                        {
+                            "from_id": from_id,
+                            "to_id": to_id,
+                            "type": "relation",
+                            "direction": "right",
+                            "labels": [rng.choice(RELATION_LABELS)],
+                        }
+                    )
+            annotations.append({"completed_by": annotator_id, "result": result})
+        tasks.append(
+            {"id": task_id, "data": {"text": text}, "annotations": annotations}
+        )
+    return tasks
@@ -0,0 +1,195 @@
+import copy
+import random
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+from random_annotations import random_tasks
+
+from lseval.adjudication import (
+    adjudicate_corpora,
+    adjudicate_file_pair,
+    get_annotation_fingerprint,
+    unique_annotations,
+    update_schema,
+)
+from lseval.instrumentation import instrument
+from lseval.schema import compile_label_config
+from lseval.utils import organize_corpus_annotations_by_annotator
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schema.xml"
+
+
+def adjudicate_tasks(tasks, overlap, filter_agreements=False):
+    corpora = organize_corpus_annotations_by_annotator(
+        tasks, {1: "alice", 2: "bob"}, []
+    )
+    return list(
+        adjudicate_corpora(
+            reference_corpus=corpora["alice"],
+            predicted_corpus=corpora["bob"],
+            reference_annotator="alice",
+            prediction_annotator="bob",
+            overlap=overlap,
+            filter_agreements=filter_agreements,
+        )
+    )
+
+
+def get_results(adjudicated_tasks, annotation_type):
+    return [
+        annotation
+        for task in adjudicated_tasks
+        for prediction in task["predictions"]
+        for annotation in prediction["result"]
+        if annotation["type"] == annotation_type
+    ]
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_adjudicated_labels_are_in_the_updated_config(seed, overlap):
+    adjudicated_tasks = adjudicate_tasks(random_tasks(random.Random(seed), 10), overlap)
+    schema = compile_label_config(update_schema(ET.parse(SCHEMA_PATH), "alice", "bob"))
+    relations = get_results(adjudicated_tasks, "relation")
+    assert relations
+    for relation in relations:
+        assert set(relation["labels"]) <= set(schema.relation_labels)
+    for choice in get_results(adjudicated_tasks, "choices"):
+        if choice["from_name"] != "IAA":
+            continue
+        assert set(choice["value"]["choices"]) <= set(
+            schema.from_name_to_decoder["IAA"].values
+        )
+
+
+def test_prediction_ids_follow_the_task_ids():
+    adjudicated_tasks = adjudicate_tasks(random_tasks(random.Random(0), 2), True)
+    assert [task["id"] for task in adjudicated_tasks] == [0, 1]
+    for task in adjudicated_tasks:
+        assert [prediction["id"] for prediction in task["predictions"]] == [
+            task["id"] + 2
+        ]
+
+
+def annotation_set_for(task, annotator_id):
+    return [
+        annotations
+        for annotations in task["annotations"]
+        if annotations["completed_by"] == annotator_id
+    ]
+
+
+# Task 1 only the reference (alice) annotated, task 2 only the prediction (bob)
+@pytest.mark.parametrize("seed", range(5))
+def test_files_only_one_side_annotated(seed):
+    tasks = random_tasks(random.Random(seed), 3)
+    tasks[1]["annotations"] = annotation_set_for(tasks[1], 1)
+    tasks[2]["annotations"] = annotation_set_for(tasks[2], 2)
+    adjudicated_tasks = {
+        task["id"]: task for task in adjudicate_tasks(tasks, overlap=True)
+    }
+    for file_id, annotator in ((1, "alice"), (2, "bob")):
+        results = get_results([adjudicated_tasks[file_id]], "choices")
+        iaa_choices = [
+            choice["value"]["choices"]
+            for choice in results
+            if choice["from_name"] == "IAA"
+        ]
+        relations = get_results([adjudicated_tasks[file_id]], "relation")
+        assert all(choices == [annotator] for choices in iaa_choices)
+        assert all(relation["labels"][0] == annotator for relation in relations)
+        assert (
+            adjudicated_tasks[file_id]["data"]["text"] == tasks[file_id]["data"]["text"]
+        )
+
+
+def test_file_pair_needs_a_file():
+    with pytest.raises(ValueError):
+        adjudicate_file_pair(
+            (None, None),
+            total_files=1,
+            reference_annotator="alice",
+            prediction_annotator="bob",
+            overlap=True,
+        )
+
+
+def naive_unique_annotations(annotations):
+    unique = []
+    for annotation in annotations:
+        if annotation not in unique:
+            unique.append(annotation)
+    return unique
+
+
+LABELS_ENTITY = {
+    "id": "a",
+    "from_name": "Event",
+    "type": "labels",
+    "value": {"start": 0, "end": 4, "text": "dose", "labels": ["Event"]},
+}
+RELATION = {
+    "from_id": "a",
+    "to_id": "b",
+    "type": "relation",
+    "direction": "right",
+    "labels": ["Probable"],
+}
+
+
+# Same fingerprint, different annotation
+def fingerprint_collision(annotation):
+    collision = copy.deepcopy(annotation)
+    collision["origin"] = "prediction"
+    if "value" in collision:
+        collision["value"]["text"] = "other"
+    assert get_annotation_fingerprint(collision) == get_annotation_fingerprint(
+        annotation
+    )
+    return collision
+
+
+@pytest.mark.parametrize("annotation", [LABELS_ENTITY, RELATION])
+def test_unique_annotations_drops_exact_duplicates_only(annotation):
+    collision = fingerprint_collision(annotation)
+    annotations = [annotation, copy.deepcopy(annotation), collision, annotation]
+    with instrument() as report:
+        unique = list(unique_annotations(annotations))
+    assert unique == [annotation, collision]
+    assert unique[1] is collision
+    assert report.counters["dedup_duplicates"] == 2
+    assert report.counters["dedup_fingerprint_collisions"] == 1
+
+
+def test_relation_fingerprints_tell_relations_apart():
+    other_relations = [
+        {**RELATION, "direction": "bi"},
+        {**RELATION, "from_id": "b", "to_id": "a"},
+        {**RELATION, "labels": ["Possible"]},
+    ]
+    for other_relation in other_relations:
+        assert get_annotation_fingerprint(other_relation) != get_annotation_fingerprint(
+            RELATION
+        )
+    assert list(unique_annotations([RELATION, *other_relations, RELATION])) == [
+        RELATION,
+        *other_relations,
+    ]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_unique_annotations_matches_naive_dedup(seed):
+    rng = random.Random(seed)
+    annotations = [
+        annotation
+        for task in random_tasks(rng, 5)
+        for annotation_set in task["annotations"]
+        for annotation in annotation_set["result"]
+    ]
+    annotations += [copy.deepcopy(rng.choice(annotations)) for _ in range(20)]
+    annotations += [fingerprint_collision(rng.choice(annotations)) for _ in range(5)]
+    rng.shuffle(annotations)
+    assert list(unique_annotations(annotations)) == naive_unique_annotations(
+        annotations
+    )
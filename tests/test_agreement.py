@@ -0,0 +1,73 @@
+import random
+from collections import Counter
+from itertools import permutations
+
+import pytest
+from random_annotations import random_file
+
+from lseval.agreement import pairwise_agreement
+from lseval.correctness_matrix import Correctness
+from lseval.datatypes import SingleAnnotatorCorpus
+from lseval.score import count_file_pair
+
+CORRECTNESS = (
+    Correctness.TRUE_POSITIVE,
+    Correctness.FALSE_POSITIVE,
+    Correctness.FALSE_NEGATIVE,
+)
+
+
+# Each annotator gets most but not all files
+def random_annotator_corpora(rng, annotators, total_files=15):
+    return {
+        annotator: SingleAnnotatorCorpus(
+            annotated_files=frozenset(
+                random_file(rng, file_id, annotator)
+                for file_id in range(total_files)
+                if rng.random() < 0.8
+            )
+        )
+        for annotator in annotators
+    }
+
+
+def get_id_to_file(corpus):
+    return {
+        annotated_file.file_id: annotated_file
+        for annotated_file in corpus.annotated_files
+    }
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_pairwise_agreement_sums_shared_file_counts(seed, overlap):
+    annotator_to_corpus = random_annotator_corpora(random.Random(seed), "abc")
+    agreement = pairwise_agreement(annotator_to_corpus, overlap=overlap)
+    for first, second in permutations(annotator_to_corpus, 2):
+        first_files = get_id_to_file(annotator_to_corpus[first])
+        second_files = get_id_to_file(annotator_to_corpus[second])
+        shared_file_ids = first_files.keys() & second_files.keys()
+        entity_totals = Counter()
+        relation_totals = Counter()
+        for file_id in shared_file_ids:
+            entity_counts, relation_counts = count_file_pair(
+                (first_files[file_id], second_files[file_id]), overlap=overlap
+            )
+            entity_totals.update(entity_counts)
+            relation_totals.update(relation_counts)
+        assert agreement.shared_files.get((first, second), 0) == len(shared_file_ids)
+        if not shared_file_ids:
+            continue
+        for totals, agreement_totals in (
+            (entity_totals, agreement.entity_totals[first, second]),
+            (relation_totals, agreement.relation_totals[first, second]),
+        ):
+            for correctness in CORRECTNESS:
+                assert agreement_totals[correctness] == totals[correctness]
+
+
+def test_worker_processes_give_the_same_agreement():
+    annotator_to_corpus = random_annotator_corpora(random.Random(0), "abc")
+    assert pairwise_agreement(annotator_to_corpus, overlap=True) == pairwise_agreement(
+        annotator_to_corpus, overlap=True, max_workers=2
+    )
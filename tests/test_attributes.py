@@ -0,0 +1,102 @@
+import random
+
+import pytest
+from random_annotations import random_corpora, random_entities
+
+from lseval.attributes import (
+    count_corpora_attributes,
+    dtr_confusion_table,
+    score_entity_attributes,
+)
+from lseval.correctness_matrix import Correctness
+from lseval.datatypes import DocTimeRel, Entity
+from lseval.score import build_entity_correctness_matrix, count_corpora
+
+
+def entity(label_studio_id, start, dtr, cuis):
+    return Entity(
+        file_id=0,
+        label_studio_id=label_studio_id,
+        span=(start, start + 5),
+        text=None,
+        dtr=dtr,
+        label="Event",
+        cuis=cuis,
+        source_annotations=(),
+    )
+
+
+PREDICTED = frozenset(
+    {
+        entity("p1", 0, DocTimeRel.BEFORE, ("C1", "C2")),
+        entity("p2", 10, DocTimeRel.AFTER, ("C3",)),
+        entity("p3", 20, DocTimeRel.OVERLAP, ("C5",)),
+        entity("p4", 30, None, ()),
+    }
+)
+REFERENCE = frozenset(
+    {
+        entity("r1", 0, DocTimeRel.BEFORE, ("C1",)),
+        entity("r2", 10, DocTimeRel.BEFORE, ("C3", "C4")),
+        entity("r4", 30, DocTimeRel.AFTER, ()),
+        entity("r5", 40, DocTimeRel.AFTER, ("C6",)),
+    }
+)
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(20))
+def test_span_correctness_matches_entity_matrix(seed, overlap):
+    rng = random.Random(seed)
+    predicted_entities = random_entities(rng, 0, rng.randint(0, 15), "p")
+    reference_entities = random_entities(rng, 0, rng.randint(0, 15), "r")
+    correctness_matrix, _ = score_entity_attributes(
+        predicted_entities, reference_entities, overlap
+    )
+    assert correctness_matrix == build_entity_correctness_matrix(
+        predicted_entities, reference_entities, overlap
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_corpus_entity_totals_match_count_corpora(seed):
+    predicted_corpus, reference_corpus = random_corpora(random.Random(seed))
+    entity_totals, _ = count_corpora_attributes(
+        predicted_corpus, reference_corpus, overlap=True
+    )
+    assert (
+        entity_totals
+        == count_corpora(predicted_corpus, reference_corpus, overlap=True)[0]
+    )
+
+
+# p3 and r5 aren't aligned with anything so only
+# (p1, r1), (p2, r2) and (p4, r4) are compared
+@pytest.mark.parametrize("overlap", [False, True])
+def test_hand_computed_attribute_agreement(overlap):
+    correctness_matrix, attribute_totals = score_entity_attributes(
+        PREDICTED, REFERENCE, overlap
+    )
+    assert len(correctness_matrix.true_positives) == 3
+    assert attribute_totals.aligned_pairs == 3
+    assert attribute_totals.dtr_confusion == {
+        (DocTimeRel.BEFORE, DocTimeRel.BEFORE): 1,
+        (DocTimeRel.AFTER, DocTimeRel.BEFORE): 1,
+        (None, DocTimeRel.AFTER): 1,
+    }
+    assert attribute_totals.get_dtr_accuracy() == pytest.approx(1 / 3)
+    dtrs, table = dtr_confusion_table(attribute_totals)
+    assert dtrs[-1] is None
+    assert sum(map(sum, table)) == 3
+    assert table[dtrs.index(DocTimeRel.AFTER)][dtrs.index(DocTimeRel.BEFORE)] == 1
+    # C1 and C3 shared, C2 predicted only, C4 reference only
+    assert attribute_totals.cui_totals[Correctness.TRUE_POSITIVE] == 2
+    assert attribute_totals.cui_totals[Correctness.FALSE_POSITIVE] == 1
+    assert attribute_totals.cui_totals[Correctness.FALSE_NEGATIVE] == 1
+    f1, precision, recall, _ = attribute_totals.get_cui_scores()
+    assert precision == pytest.approx(2 / 3)
+    assert recall == pytest.approx(2 / 3)
+    assert f1 == pytest.approx(2 / 3)
+    # Both CUI pairs share one of two CUIs, (p4, r4) has none
+    assert attribute_totals.cui_pairs == 2
+    assert attribute_totals.get_cui_jaccard() == pytest.approx(1 / 2)
@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+from random_annotations import random_corpora
+
+from lseval.bootstrap import (
+    COUNT_COLUMNS,
+    array_scores,
+    bootstrap_scores,
+    corpus_file_counts,
+    pack_columns,
+    paired_bootstrap_test,
+    resample_batch,
+)
+from lseval.correctness_matrix import Correctness, score_totals
+from lseval.score import count_file_pair, pair_files_by_id
+
+
+def naive_resample_batch(count_arrays, batch_size, rng):
+    file_indices = rng.integers(
+        0, len(count_arrays[0]), size=(batch_size, len(count_arrays[0])), dtype=np.int32
+    )
+    return tuple(counts[file_indices].sum(axis=1) for counts in count_arrays)
+
+
+# Small counts get packed, huge ones fall back to per column sums
+@pytest.mark.parametrize("maximum", [5, 1 << 40])
+def test_resample_batch_matches_naive_gather(maximum):
+    rng = np.random.default_rng(0)
+    count_arrays = [rng.integers(0, maximum, size=(50, 3)) for _ in range(2)]
+    packings = [pack_columns(counts) for counts in count_arrays]
+    assert (packings[0] is None) == (maximum > 5)
+    totals = resample_batch(count_arrays, packings, 20, np.random.default_rng(1))
+    expected = naive_resample_batch(count_arrays, 20, np.random.default_rng(1))
+    for batch_totals, expected_totals in zip(totals, expected, strict=True):
+        np.testing.assert_array_equal(batch_totals, expected_totals)
+
+
+def test_results_do_not_depend_on_threads():
+    counts = np.random.default_rng(0).integers(0, 20, size=(200, 3))
+    assert bootstrap_scores(
+        counts, replicates=500, seed=3, max_workers=1
+    ) == bootstrap_scores(counts, replicates=500, seed=3, max_workers=4)
+    assert paired_bootstrap_test(
+        counts, counts[::-1], replicates=500, seed=3, max_workers=1
+    ) == paired_bootstrap_test(
+        counts, counts[::-1], replicates=500, seed=3, max_workers=4
+    )
+
+
+def test_interval_brackets_estimate():
+    counts = np.random.default_rng(0).integers(0, 20, size=(200, 3))
+    scores = bootstrap_scores(counts, replicates=2_000, seed=0)
+    for interval in (scores.f1, scores.precision, scores.recall):
+        assert interval.lower <= interval.estimate <= interval.upper
+
+
+def test_array_scores_match_score_totals():
+    counts = np.array([[3, 1, 2], [0, 0, 4], [0, 5, 0], [0, 0, 0]])
+    for row in counts:
+        expected = score_totals(
+            {
+                Correctness.TRUE_POSITIVE: int(row[0]),
+                Correctness.TRUE_NEGATIVE: 0,
+                Correctness.FALSE_POSITIVE: int(row[1]),
+                Correctness.FALSE_NEGATIVE: int(row[2]),
+            }
+        )[:3]
+        np.testing.assert_allclose(array_scores(row), expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_corpus_file_counts_rows_are_file_counts(seed):
+    predicted_corpus, reference_corpus = random_corpora(random.Random(seed))
+    file_counts = corpus_file_counts(predicted_corpus, reference_corpus, overlap=True)
+    id_to_file_pair = pair_files_by_id(predicted_corpus, reference_corpus)
+    assert file_counts.file_ids.tolist() == list(id_to_file_pair.keys())
+    for row, file_pair in enumerate(id_to_file_pair.values()):
+        entity_counts, relation_counts = count_file_pair(file_pair, overlap=True)
+        for counts, array in (
+            (entity_counts, file_counts.entity_counts),
+            (relation_counts, file_counts.relation_counts),
+        ):
+            assert array[row].tolist() == [counts[column] for column in COUNT_COLUMNS]
+    pooled = corpus_file_counts(
+        predicted_corpus, reference_corpus, overlap=True, max_workers=2
+    )
+    assert np.array_equal(pooled.entity_counts, file_counts.entity_counts)
+    assert np.array_equal(pooled.relation_counts, file_counts.relation_counts)
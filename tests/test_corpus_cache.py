@@ -0,0 +1,43 @@
+import pickle
+import random
+from sys import intern
+
+import pytest
+from random_annotations import random_corpora
+
+from lseval.corpus_cache import ParsedCorpusCache
+
+
+def test_round_trip_reinterns_labels(tmp_path):
+    cache = ParsedCorpusCache(cache_directory=tmp_path)
+    predicted_corpus, reference_corpus = random_corpora(random.Random(0))
+    annotator_to_corpus = {"p": predicted_corpus, "r": reference_corpus}
+    cache.store("key", annotator_to_corpus)
+    loaded = cache.load("key")
+    assert loaded == annotator_to_corpus
+    for corpus in loaded.values():
+        for annotated_file in corpus.annotated_files:
+            for entity in annotated_file.entities:
+                assert entity.label is intern(entity.label)
+
+
+# Pickles left behind by older code, referring to a module that's
+# gone or calling a constructor whose signature has changed
+@pytest.mark.parametrize(
+    "stale_pickle",
+    [
+        b"clseval.removed_module\nRemovedClass\n.",
+        b"clseval.datatypes\nEntity\n(tR.",
+        b"not a pickle",
+        pickle.dumps({"p": None})[:-3],
+    ],
+)
+def test_stale_cache_is_a_miss(tmp_path, stale_pickle):
+    cache = ParsedCorpusCache(cache_directory=tmp_path)
+    cache.get_path("key").write_bytes(stale_pickle)
+    assert cache.load("key") is None
+    assert not cache.get_path("key").exists()
+
+
+def test_missing_cache_is_a_miss(tmp_path):
+    assert ParsedCorpusCache(cache_directory=tmp_path).load("key") is None
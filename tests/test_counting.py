@@ -0,0 +1,63 @@
+import random
+from collections import Counter
+
+import pytest
+from random_annotations import random_corpora, random_file
+
+from lseval.score import (
+    build_entity_correctness_matrix,
+    build_relation_correctness_matrix,
+    count_corpora,
+    count_entity_correctness,
+    count_relation_correctness,
+    score_corpora,
+)
+
+SEEDS = range(30)
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_counts_match_correctness_matrices(seed, overlap):
+    rng = random.Random(seed)
+    predicted_file = random_file(rng, 0, "p")
+    reference_file = random_file(rng, 0, "r")
+    assert count_entity_correctness(
+        predicted_file.entities, reference_file.entities, overlap=overlap
+    ) == Counter(
+        build_entity_correctness_matrix(
+            predicted_file.entities, reference_file.entities, overlap=overlap
+        ).to_correctness_totals()
+    )
+    assert count_relation_correctness(
+        predicted_file.relations, reference_file.relations, overlap=overlap
+    ) == Counter(
+        build_relation_correctness_matrix(
+            predicted_file.relations, reference_file.relations, overlap=overlap
+        ).to_correctness_totals()
+    )
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_corpus_counts_match_corpus_matrices(seed, overlap):
+    predicted_corpus, reference_corpus = random_corpora(random.Random(seed))
+    entity_totals, relation_totals = count_corpora(
+        predicted_corpus, reference_corpus, overlap=overlap
+    )
+    entity_matrix, relation_matrix = score_corpora(
+        predicted_corpus, reference_corpus, overlap=overlap
+    )
+    for totals, correctness_matrix in (
+        (entity_totals, entity_matrix),
+        (relation_totals, relation_matrix),
+    ):
+        for correctness, total in correctness_matrix.to_correctness_totals().items():
+            assert totals[correctness] == total
+
+
+def test_worker_processes_give_the_same_totals():
+    predicted_corpus, reference_corpus = random_corpora(random.Random(0))
+    assert count_corpora(
+        predicted_corpus, reference_corpus, overlap=True
+    ) == count_corpora(predicted_corpus, reference_corpus, overlap=True, max_workers=2)
@@ -0,0 +1,51 @@
+import json
+import random
+
+import pytest
+
+from lseval.datatypes import Entity, overlap_exists, paired_overlap_exists
+
+
+def decoded_entity(annotation_json):
+    annotation = json.loads(annotation_json)
+    return Entity(
+        file_id=0,
+        label_studio_id=annotation["id"],
+        span=(annotation["start"], annotation["end"]),
+        text=None,
+        dtr=None,
+        label=annotation["label"],
+        cuis=(),
+        source_annotations=(),
+    )
+
+
+# Decoded separately each would be its own string
+def test_labels_are_interned():
+    annotation_json = '{"id": "region-7", "start": 0, "end": 4, "label": "Event"}'
+    first = decoded_entity(annotation_json)
+    second = decoded_entity(annotation_json)
+    assert first.label is second.label
+
+
+def random_distinct_span_pair(rng, text_length=30):
+    first = second = None
+    while first == second:
+        first, second = (
+            (start, start + rng.randint(1, 10))
+            for start in (rng.randrange(text_length), rng.randrange(text_length))
+        )
+    return first, second
+
+
+# Against the general bijection search it replaces for relations,
+# argument spans of a relation are distinct
+@pytest.mark.parametrize("seed", range(5))
+def test_paired_overlap_exists_matches_overlap_exists(seed):
+    rng = random.Random(seed)
+    for _ in range(2_000):
+        first = random_distinct_span_pair(rng)
+        second = random_distinct_span_pair(rng)
+        assert paired_overlap_exists(*first, *second) == overlap_exists(
+            set(first), set(second)
+        )
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+from random_annotations import random_entities, random_span
+
+from lseval.datatypes import overlap_match
+from lseval.score import (
+    brute_force_overlap_entity_correctness_matrix,
+    build_entity_correctness_matrix,
+    overlap_entity_correctness_matrix,
+)
+from lseval.span_index import build_span_index
+
+SEEDS = range(50)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_span_index_matches_brute_force(seed):
+    rng = random.Random(seed)
+    spans = [random_span(rng) for _ in range(rng.randint(0, 20))]
+    span_index = build_span_index((span, index) for index, span in enumerate(spans))
+    for _ in range(20):
+        query = random_span(rng)
+        expected = {
+            index for index, span in enumerate(spans) if overlap_match(span, query)
+        }
+        assert set(span_index.overlapping(query)) == expected
+        assert span_index.overlaps_any(query) == bool(expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_overlap_entity_matching_matches_brute_force(seed):
+    rng = random.Random(seed)
+    predicted = random_entities(rng, 0, rng.randint(0, 15), "p")
+    reference = random_entities(rng, 0, rng.randint(0, 15), "r")
+    assert overlap_entity_correctness_matrix(
+        predicted, reference
+    ) == brute_force_overlap_entity_correctness_matrix(predicted, reference)
+    assert build_entity_correctness_matrix(
+        predicted, reference, overlap=True
+    ) == build_entity_correctness_matrix(
+        predicted, reference, overlap=True, brute_force=True
+    )
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_entity_matching_matches_brute_force(seed):
+    rng = random.Random(seed)
+    predicted = random_entities(rng, 0, rng.randint(0, 15), "p")
+    reference = random_entities(rng, 0, rng.randint(0, 15), "r")
+    correctness_matrix = build_entity_correctness_matrix(
+        predicted, reference, overlap=False
+    )
+    assert correctness_matrix.true_positives == {
+        entity
+        for entity in predicted
+        if any(entity.span_match(other) for other in reference)
+    }
+    assert correctness_matrix.false_positives == predicted - set(
+        correctness_matrix.true_positives
+    )
+    assert correctness_matrix.false_negatives == {
+        entity
+        for entity in reference
+        if not any(entity.span_match(other) for other in predicted)
+    }
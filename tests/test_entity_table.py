@@ -0,0 +1,75 @@
+import random
+from collections import Counter
+from dataclasses import replace
+
+import pytest
+from random_annotations import random_corpora, random_entities
+
+from lseval.datatypes import AnnotatedFile, SingleAnnotatorCorpus
+from lseval.entity_table import (
+    build_corpus_entity_table,
+    build_entity_table,
+    count_exact_entity_table_correctness,
+    exact_entity_table_correctness_matrix,
+)
+from lseval.score import build_entity_correctness_matrix, score_corpora
+
+
+def assert_matches_exact_matcher(predicted_corpus, reference_corpus):
+    predicted_table = build_corpus_entity_table(predicted_corpus)
+    reference_table = build_corpus_entity_table(reference_corpus)
+    entity_matrix, _ = score_corpora(predicted_corpus, reference_corpus, overlap=False)
+    assert (
+        exact_entity_table_correctness_matrix(predicted_table, reference_table)
+        == entity_matrix
+    )
+    assert count_exact_entity_table_correctness(
+        predicted_table, reference_table
+    ) == Counter(entity_matrix.to_correctness_totals())
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_table_join_matches_exact_matcher(seed):
+    assert_matches_exact_matcher(*random_corpora(random.Random(seed)))
+
+
+# Several entities on one span, on one side or both, all take
+# the span's correctness.  The same span in another file never matches
+def test_duplicate_spans():
+    entity = next(iter(random_entities(random.Random(0), 0, 1, "e")))
+    predicted = [
+        replace(entity, label_studio_id="p0", span=(5, 9)),
+        replace(entity, label_studio_id="p1", span=(5, 9)),
+        replace(entity, label_studio_id="p2", span=(5, 9)),
+        replace(entity, label_studio_id="p3", span=(0, 1)),
+    ]
+    reference = [
+        replace(entity, label_studio_id="r0", span=(5, 9)),
+        replace(entity, label_studio_id="r1", span=(5, 9)),
+        replace(entity, label_studio_id="r2", file_id=1, span=(0, 1)),
+    ]
+    correctness_matrix = exact_entity_table_correctness_matrix(
+        build_entity_table(predicted), build_entity_table(reference)
+    )
+
+    def get_ids(entities):
+        return {entity.label_studio_id for entity in entities}
+
+    assert get_ids(correctness_matrix.true_positives) == {"p0", "p1", "p2"}
+    assert get_ids(correctness_matrix.false_positives) == {"p3"}
+    assert get_ids(correctness_matrix.false_negatives) == {"r2"}
+    assert correctness_matrix.true_positives == (
+        build_entity_correctness_matrix(
+            predicted[:3], reference[:2], overlap=False
+        ).true_positives
+    )
+
+
+def test_empty_files_and_tables():
+    empty_file = AnnotatedFile(file_id=0, file_text="")
+    empty_corpus = SingleAnnotatorCorpus(annotated_files=frozenset({empty_file}))
+    predicted_corpus, reference_corpus = random_corpora(random.Random(0))
+    assert_matches_exact_matcher(empty_corpus, empty_corpus)
+    assert_matches_exact_matcher(SingleAnnotatorCorpus(), SingleAnnotatorCorpus())
+    assert_matches_exact_matcher(empty_corpus, reference_corpus)
+    assert_matches_exact_matcher(predicted_corpus, empty_corpus)
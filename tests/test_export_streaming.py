@@ -0,0 +1,88 @@
+import io
+import json
+import random
+import time
+
+import pytest
+
+from lseval.utils import read_label_studio_export, write_label_studio_tasks
+
+
+def random_tasks(rng, total_tasks):
+    return [
+        {
+            "id": task_id,
+            "data": {"text": "x" * rng.randint(0, 300)},
+            "annotations": [
+                {
+                    "completed_by": rng.randint(1, 4),
+                    "result": [{"id": "a"}] * rng.randint(0, 5),
+                }
+                for _ in range(rng.randint(0, 3))
+            ],
+        }
+        for task_id in range(total_tasks)
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+@pytest.mark.parametrize("seed", range(5))
+def test_streamed_array_matches_json_load(seed, chunk_size):
+    tasks = random_tasks(random.Random(seed), 50)
+    for export in (json.dumps(tasks), json.dumps(tasks, indent=2)):
+        streamed = read_label_studio_export(
+            io.BytesIO(export.encode()), chunk_size=chunk_size
+        )
+        assert list(streamed) == tasks
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64])
+def test_streamed_jsonl_matches_json_load(chunk_size):
+    tasks = random_tasks(random.Random(0), 50)
+    export = "\n".join(map(json.dumps, tasks))
+    streamed = read_label_studio_export(
+        io.BytesIO(export.encode()), chunk_size=chunk_size
+    )
+    assert list(streamed) == tasks
+
+
+@pytest.mark.parametrize(
+    "export",
+    [
+        "[",
+        '[{"id": 1}',
+        '[{"id": 1} {"id": 2}]',
+        "[1]",
+        '{"id": 1} [',
+        '[{"id": 1},]',
+        '[{"id": 1}, ]',
+        "[,]",
+    ],
+)
+def test_malformed_array_raises(export):
+    with pytest.raises(ValueError):
+        list(read_label_studio_export(io.BytesIO(export.encode()), jsonl=False))
+
+
+# Many small tasks inside one large chunk, copying the rest of
+# the buffer after each task would make this quadratic
+def test_many_tasks_in_one_chunk_is_linear():
+    export = json.dumps([{"id": task_id} for task_id in range(200_000)]).encode()
+    start = time.perf_counter()
+    total_tasks = sum(
+        1 for _ in read_label_studio_export(io.BytesIO(export), chunk_size=len(export))
+    )
+    assert total_tasks == 200_000
+    assert time.perf_counter() - start < 5
+
+
+@pytest.mark.parametrize("jsonl", [False, True])
+@pytest.mark.parametrize("total_tasks", [0, 1, 50])
+def test_written_tasks_read_back(tmp_path, jsonl, total_tasks):
+    tasks = random_tasks(random.Random(total_tasks), total_tasks)
+    export_path = tmp_path / "tasks.json"
+    # A generator, as adjudicate_corpora gives
+    assert write_label_studio_tasks(iter(tasks), export_path, jsonl=jsonl) == len(tasks)
+    assert list(read_label_studio_export(export_path)) == tasks
+    if not jsonl:
+        assert json.loads(export_path.read_text()) == tasks
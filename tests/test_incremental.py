@@ -0,0 +1,106 @@
+import copy
+import json
+import random
+
+import pytest
+from random_annotations import random_region, random_tasks
+
+from lseval.incremental import INCREMENTAL_CACHE_VERSION, incremental_score_export
+from lseval.score import count_corpora
+from lseval.utils import organize_corpus_annotations_by_annotator
+
+ID_TO_ANNOTATOR = {1: "reference", 2: "prediction", 3: "other"}
+
+
+def incremental_scores(tasks, cache_path, overlap=True):
+    return incremental_score_export(
+        tasks,
+        ID_TO_ANNOTATOR,
+        annotator_ids_to_ignore=[],
+        prediction_annotator="prediction",
+        reference_annotator="reference",
+        overlap=overlap,
+        cache_path=cache_path,
+    )
+
+
+def fresh_totals(tasks, overlap=True):
+    annotator_to_corpus = organize_corpus_annotations_by_annotator(
+        tasks, ID_TO_ANNOTATOR, []
+    )
+    return count_corpora(
+        annotator_to_corpus["prediction"],
+        annotator_to_corpus["reference"],
+        overlap=overlap,
+    )
+
+
+def assert_fresh_totals(scores, tasks, overlap=True):
+    entity_totals, relation_totals = fresh_totals(tasks, overlap)
+    assert scores.entity_totals == entity_totals
+    assert scores.relation_totals == relation_totals
+
+
+def add_region(task, annotator_id, rng):
+    for annotations in task["annotations"]:
+        if annotations["completed_by"] == annotator_id:
+            annotations["result"].extend(
+                random_region(rng, "added", (70, 75), task["data"]["text"])
+            )
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_only_changed_tasks_are_rescored(tmp_path, seed, overlap):
+    rng = random.Random(seed)
+    tasks = random_tasks(rng, 12, annotator_ids=(1, 2, 3))
+    cache_path = tmp_path / "scores.json"
+    scores = incremental_scores(tasks, cache_path, overlap)
+    assert scores.rescored_file_ids == list(range(12))
+    assert_fresh_totals(scores, tasks, overlap)
+
+    scores = incremental_scores(tasks, cache_path, overlap)
+    assert scores.rescored_file_ids == []
+    assert scores.reused_file_ids == list(range(12))
+    assert_fresh_totals(scores, tasks, overlap)
+
+    # Task 3 edited by the reference, task 5 deleted and
+    # task 7 edited by an annotator who isn't compared
+    edited_tasks = copy.deepcopy(tasks)
+    add_region(edited_tasks[3], 1, rng)
+    add_region(edited_tasks[7], 3, rng)
+    del edited_tasks[5]
+    scores = incremental_scores(edited_tasks, cache_path, overlap)
+    assert scores.rescored_file_ids == [3]
+    assert sorted(scores.reused_file_ids) == [
+        file_id for file_id in range(12) if file_id not in (3, 5)
+    ]
+    assert_fresh_totals(scores, edited_tasks, overlap)
+    assert "5" not in json.loads(cache_path.read_text())["files"]
+
+
+def test_cache_from_another_version_is_ignored(tmp_path):
+    tasks = random_tasks(random.Random(0), 6)
+    cache_path = tmp_path / "scores.json"
+    incremental_scores(tasks, cache_path)
+    # Records which would otherwise be reused as they are
+    cache = json.loads(cache_path.read_text())
+    cache["version"] = INCREMENTAL_CACHE_VERSION + 1
+    for record in cache["files"].values():
+        record["entity"] = [1_000, 0, 0, 0]
+    cache_path.write_text(json.dumps(cache))
+    scores = incremental_scores(tasks, cache_path)
+    assert scores.rescored_file_ids == list(range(6))
+    assert_fresh_totals(scores, tasks)
+
+
+@pytest.mark.parametrize("cache_text", ["not json", '{"version": 1, "fil'])
+def test_unreadable_cache_is_ignored(tmp_path, cache_text):
+    tasks = random_tasks(random.Random(0), 6)
+    cache_path = tmp_path / "scores.json"
+    cache_path.write_text(cache_text)
+    scores = incremental_scores(tasks, cache_path)
+    assert scores.rescored_file_ids == list(range(6))
+    assert_fresh_totals(scores, tasks)
+    # and replaced with a readable one
+    assert incremental_scores(tasks, cache_path).rescored_file_ids == []
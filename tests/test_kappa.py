@@ -0,0 +1,246 @@
+import random
+import re
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pytest
+from random_annotations import LABELS, random_entities
+
+from lseval.datatypes import AnnotatedFile, Entity, SingleAnnotatorCorpus
+from lseval.kappa import (
+    build_label_arrays,
+    cohens_kappa,
+    corpus_fleiss_kappa,
+    fleiss_kappa,
+    label_coverage,
+    pairwise_cohens_kappa,
+)
+
+OUTSIDE = "O"
+
+
+# Every annotator labels the same text for a file but only gets
+# to most files.  Spans are unique within a file since which of two
+# entities with the same span paints last isn't defined
+def random_annotator_corpora(rng, annotators, total_files=8):
+    file_texts = ["".join(rng.choices("ab  ", k=60)) for _ in range(total_files)]
+    return {
+        annotator: SingleAnnotatorCorpus(
+            annotated_files=frozenset(
+                AnnotatedFile(
+                    file_id=file_id,
+                    file_text=file_text,
+                    entities=frozenset(
+                        {
+                            entity.span: entity
+                            for entity in sorted(
+                                random_entities(
+                                    rng, file_id, rng.randint(0, 10), annotator
+                                ),
+                                key=lambda entity: entity.label_studio_id,
+                            )
+                        }.values()
+                    ),
+                )
+                for file_id, file_text in enumerate(file_texts)
+                if rng.random() < 0.8
+            )
+        )
+        for annotator in annotators
+    }
+
+
+# Label of the innermost entity covering each character
+def naive_character_labels(annotated_file):
+    labels = []
+    for character in range(len(annotated_file.file_text)):
+        covering = [
+            entity
+            for entity in annotated_file.entities
+            if entity.span[0] <= character < entity.span[1]
+        ]
+        labels.append(
+            max(covering, key=lambda entity: (entity.span[0], -entity.span[1])).label
+            if covering
+            else OUTSIDE
+        )
+    return labels
+
+
+def naive_unit_labels(annotated_file, tokens):
+    character_labels = naive_character_labels(annotated_file)
+    if not tokens:
+        return character_labels
+    return [
+        character_labels[match.start()]
+        for match in re.finditer(r"\S+", annotated_file.file_text)
+    ]
+
+
+# Annotator by annotator unit labels over the files all of them have
+def naive_annotator_labels(annotator_to_corpus, tokens):
+    id_to_files = [
+        {
+            annotated_file.file_id: annotated_file
+            for annotated_file in corpus.annotated_files
+        }
+        for corpus in annotator_to_corpus.values()
+    ]
+    shared_file_ids = sorted(
+        set.intersection(*(set(id_to_file) for id_to_file in id_to_files))
+    )
+    return shared_file_ids, [
+        [
+            label
+            for file_id in shared_file_ids
+            for label in naive_unit_labels(id_to_file[file_id], tokens)
+        ]
+        for id_to_file in id_to_files
+    ]
+
+
+def naive_cohens_kappa(first_labels, second_labels):
+    units = len(first_labels)
+    observed = sum(map(str.__eq__, first_labels, second_labels)) / units
+    first_counts = Counter(first_labels)
+    second_counts = Counter(second_labels)
+    expected = sum(
+        first_counts[label] * second_counts[label] for label in first_counts
+    ) / (units * units)
+    return observed, expected, (observed - expected) / (1 - expected)
+
+
+def naive_fleiss_kappa(annotator_labels):
+    raters = len(annotator_labels)
+    units = len(annotator_labels[0])
+    unit_agreements = []
+    label_totals = Counter()
+    for unit_labels in zip(*annotator_labels, strict=True):
+        label_counts = Counter(unit_labels)
+        label_totals.update(label_counts)
+        unit_agreements.append(
+            sum(count * (count - 1) for count in label_counts.values())
+            / (raters * (raters - 1))
+        )
+    observed = sum(unit_agreements) / units
+    expected = sum((total / (raters * units)) ** 2 for total in label_totals.values())
+    return observed, expected, (observed - expected) / (1 - expected)
+
+
+def decoded_labels(label_arrays):
+    labels = (OUTSIDE, *label_arrays.labels)
+    return [
+        [labels[code] for code in label_codes]
+        for label_codes in label_arrays.label_codes
+    ]
+
+
+@pytest.mark.parametrize("tokens", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_label_arrays_match_naive_painting(seed, tokens):
+    annotator_to_corpus = random_annotator_corpora(random.Random(seed), "abc")
+    label_arrays = build_label_arrays(annotator_to_corpus, tokens=tokens)
+    shared_file_ids, annotator_labels = naive_annotator_labels(
+        annotator_to_corpus, tokens
+    )
+    assert label_arrays.file_ids.tolist() == shared_file_ids
+    assert label_arrays.offsets[-1] == len(annotator_labels[0])
+    assert decoded_labels(label_arrays) == annotator_labels
+    coverage = label_coverage(label_arrays)
+    for position, labels in enumerate(annotator_labels):
+        label_counts = Counter(labels)
+        assert coverage[position].tolist() == [
+            label_counts[label] for label in (OUTSIDE, *label_arrays.labels)
+        ]
+
+
+@pytest.mark.parametrize("tokens", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_kappas_match_naive_per_unit_kappas(seed, tokens):
+    annotator_to_corpus = random_annotator_corpora(random.Random(seed), "abc")
+    label_arrays = build_label_arrays(annotator_to_corpus, tokens=tokens)
+    _, annotator_labels = naive_annotator_labels(annotator_to_corpus, tokens)
+    kappa_matrix = pairwise_cohens_kappa(label_arrays)
+    for first, second in combinations(range(3), r=2):
+        kappa_scores = cohens_kappa(
+            label_arrays.label_codes[first],
+            label_arrays.label_codes[second],
+            label_arrays.total_codes(),
+        )
+        observed, expected, kappa = naive_cohens_kappa(
+            annotator_labels[first], annotator_labels[second]
+        )
+        assert kappa_scores.observed_agreement == pytest.approx(observed)
+        assert kappa_scores.expected_agreement == pytest.approx(expected)
+        assert kappa_scores.kappa == pytest.approx(kappa)
+        assert kappa_matrix[first, second] == kappa_matrix[second, first]
+        assert kappa_matrix[first, second] == pytest.approx(kappa)
+    kappa_scores = corpus_fleiss_kappa(label_arrays)
+    observed, expected, kappa = naive_fleiss_kappa(annotator_labels)
+    assert kappa_scores.observed_agreement == pytest.approx(observed)
+    assert kappa_scores.expected_agreement == pytest.approx(expected)
+    assert kappa_scores.kappa == pytest.approx(kappa)
+    assert kappa_scores.units == len(annotator_labels[0])
+
+
+# With two raters Fleiss' kappa only differs from Cohen's
+# in pooling the two raters' label distributions
+def test_two_rater_fleiss_pools_label_distributions():
+    rng = np.random.default_rng(0)
+    label_codes = rng.integers(0, 4, size=(2, 500))
+    observed, expected, kappa = naive_fleiss_kappa(
+        [list(map(str, codes)) for codes in label_codes]
+    )
+    kappa_scores = fleiss_kappa(label_codes, 4)
+    assert kappa_scores.observed_agreement == pytest.approx(observed)
+    assert kappa_scores.expected_agreement == pytest.approx(expected)
+    assert kappa_scores.kappa == pytest.approx(kappa)
+
+
+def entity(label_studio_id, span, label):
+    return Entity(
+        file_id=0,
+        label_studio_id=label_studio_id,
+        span=span,
+        text=None,
+        dtr=None,
+        label=label,
+        cuis=(),
+        source_annotations=(),
+    )
+
+
+def test_nested_entities_keep_their_own_label():
+    annotated_file = AnnotatedFile(
+        file_id=0,
+        file_text="aaaa bb cc",
+        entities=frozenset(
+            {entity("inner", (5, 7), LABELS[1]), entity("outer", (0, 10), LABELS[0])}
+        ),
+    )
+    label_arrays = build_label_arrays(
+        {"a": SingleAnnotatorCorpus(annotated_files=frozenset({annotated_file}))}
+    )
+    assert decoded_labels(label_arrays) == [
+        [LABELS[0]] * 5 + [LABELS[1]] * 2 + [LABELS[0]] * 3
+    ]
+    token_arrays = build_label_arrays(
+        {"a": SingleAnnotatorCorpus(annotated_files=frozenset({annotated_file}))},
+        tokens=True,
+    )
+    assert decoded_labels(token_arrays) == [[LABELS[0], LABELS[1], LABELS[0]]]
+
+
+def test_no_shared_files_gives_no_units():
+    first = AnnotatedFile(file_id=0, file_text="a b")
+    second = AnnotatedFile(file_id=1, file_text="a b")
+    label_arrays = build_label_arrays(
+        {
+            "a": SingleAnnotatorCorpus(annotated_files=frozenset({first})),
+            "b": SingleAnnotatorCorpus(annotated_files=frozenset({second})),
+        }
+    )
+    assert label_arrays.file_ids.tolist() == []
+    assert label_arrays.label_codes.shape == (2, 0)
+    assert np.isnan(corpus_fleiss_kappa(label_arrays).kappa)
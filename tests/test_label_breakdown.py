@@ -0,0 +1,65 @@
+import random
+from collections import Counter
+from math import isnan
+
+import pytest
+from random_annotations import random_corpora
+
+from lseval.correctness_matrix import Correctness
+from lseval.label_breakdown import LabelBreakdown, count_corpora_by_label
+from lseval.score import count_corpora
+
+
+def totals(true_positives, false_positives, false_negatives):
+    return Counter(
+        {
+            Correctness.TRUE_POSITIVE: true_positives,
+            Correctness.TRUE_NEGATIVE: 0,
+            Correctness.FALSE_POSITIVE: false_positives,
+            Correctness.FALSE_NEGATIVE: false_negatives,
+        }
+    )
+
+
+# A label the run missed entirely counts as 0, not as absent
+@pytest.mark.parametrize(
+    "missed_totals", [totals(0, 0, 50), totals(0, 5, 50), totals(0, 5, 0)]
+)
+def test_macro_scores_count_undefined_labels_as_zero(missed_totals):
+    breakdown = LabelBreakdown(
+        label_to_totals={"A": totals(10, 0, 0), "B": missed_totals}
+    )
+    f1, precision, recall, _ = breakdown.get_macro_scores()
+    assert f1 == pytest.approx(0.5)
+    assert precision == pytest.approx(0.5)
+    assert recall == pytest.approx(0.5)
+
+
+def test_macro_scores_skip_labels_never_seen():
+    breakdown = LabelBreakdown(
+        label_to_totals={"A": totals(10, 0, 0), "B": totals(0, 0, 0)}
+    )
+    assert breakdown.get_macro_scores() == (1.0, 1.0, 1.0, 10)
+    assert all(isnan(score) for score in LabelBreakdown().get_macro_scores()[:3])
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_micro_totals_match_corpus_counts(seed, overlap):
+    predicted_corpus, reference_corpus = random_corpora(random.Random(seed))
+    entity_breakdown, relation_breakdown = count_corpora_by_label(
+        predicted_corpus, reference_corpus, overlap=overlap
+    )
+    entity_totals, relation_totals = count_corpora(
+        predicted_corpus, reference_corpus, overlap=overlap
+    )
+    # Relations never match across labels so the totals add up,
+    # entities do match across labels, so only the predictions add up
+    assert relation_breakdown.get_micro_totals() == relation_totals
+    entity_micro_totals = entity_breakdown.get_micro_totals()
+    assert (
+        entity_micro_totals[Correctness.TRUE_POSITIVE]
+        + entity_micro_totals[Correctness.FALSE_POSITIVE]
+        == entity_totals[Correctness.TRUE_POSITIVE]
+        + entity_totals[Correctness.FALSE_POSITIVE]
+    )
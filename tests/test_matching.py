@@ -0,0 +1,125 @@
+import random
+
+import pytest
+from random_annotations import random_entities, random_relations
+
+from lseval.correctness_matrix import Correctness
+from lseval.matching import cardinality_first_weights, maximum_weight_matching
+from lseval.score import (
+    build_entity_correctness_matrix,
+    build_relation_correctness_matrix,
+)
+
+
+# Best total weight over every matching, by trying each left
+# node unmatched or with each of its free neighbours
+def brute_force_best(edges, key=lambda matching: sum(matching.values())):
+    lefts = sorted({left for left, _, _ in edges})
+    left_to_edges = {
+        left: [edge for edge in edges if edge[0] == left] for left in lefts
+    }
+
+    def search(position, used_rights, matching):
+        if position == len(lefts):
+            return key(matching)
+        best = search(position + 1, used_rights, matching)
+        for left, right, weight in left_to_edges[lefts[position]]:
+            if right in used_rights:
+                continue
+            matching[left, right] = weight
+            best = max(best, search(position + 1, used_rights | {right}, matching))
+            del matching[left, right]
+        return best
+
+    return search(0, frozenset(), {})
+
+
+def random_edges(rng):
+    return list(
+        {
+            (rng.randrange(6), rng.randrange(6)): rng.randint(1, 9)
+            for _ in range(rng.randint(0, 14))
+        }.items()
+    )
+
+
+def as_edges(weighted_pairs):
+    return [(left, right, weight) for (left, right), weight in weighted_pairs]
+
+
+def check_matching(edges, matching):
+    pair_to_weight = {(left, right): weight for left, right, weight in edges}
+    assert all(pair in pair_to_weight for pair in matching)
+    assert len({left for left, _ in matching}) == len(matching)
+    assert len({right for _, right in matching}) == len(matching)
+    return sum(pair_to_weight[pair] for pair in matching)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_maximum_weight_matching_matches_brute_force(seed):
+    edges = as_edges(random_edges(random.Random(seed)))
+    matching = maximum_weight_matching(edges)
+    assert check_matching(edges, matching) == brute_force_best(edges)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_cardinality_first_weights_maximise_pairs(seed):
+    edges = as_edges(random_edges(random.Random(seed)))
+    matching = maximum_weight_matching(cardinality_first_weights(edges))
+    check_matching(edges, matching)
+    assert len(matching) == brute_force_best(edges, key=len)
+
+
+def check_one_to_one_totals(correctness_matrix, predicted, reference, compatible):
+    edges = [
+        (prediction_index, reference_index, 1)
+        for prediction_index, prediction in enumerate(predicted)
+        for reference_index, reference_item in enumerate(reference)
+        if compatible(prediction, reference_item)
+    ]
+    totals = correctness_matrix.to_correctness_totals()
+    true_positives = totals[Correctness.TRUE_POSITIVE]
+    assert true_positives == brute_force_best(edges, key=len)
+    assert true_positives + totals[Correctness.FALSE_POSITIVE] == len(predicted)
+    assert true_positives + totals[Correctness.FALSE_NEGATIVE] == len(reference)
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(50))
+def test_one_to_one_entities_pair_up_the_most(seed, overlap):
+    rng = random.Random(seed)
+    predicted = sorted(random_entities(rng, 0, rng.randint(0, 8), "p"), key=str)
+    reference = sorted(random_entities(rng, 0, rng.randint(0, 8), "r"), key=str)
+    check_one_to_one_totals(
+        build_entity_correctness_matrix(
+            frozenset(predicted), frozenset(reference), overlap, one_to_one=True
+        ),
+        predicted,
+        reference,
+        lambda prediction, reference_entity: prediction.span_match(
+            reference_entity, overlap
+        ),
+    )
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+@pytest.mark.parametrize("seed", range(50))
+def test_one_to_one_relations_pair_up_the_most(seed, overlap):
+    rng = random.Random(seed)
+    entities = random_entities(rng, 0, rng.randint(2, 10), "e")
+    predicted = sorted(random_relations(rng, entities, rng.randint(0, 8)), key=str)
+    reference = sorted(random_relations(rng, entities, rng.randint(0, 8)), key=str)
+
+    def compatible(prediction, reference_relation):
+        if overlap:
+            return prediction.overlap_match(reference_relation)
+        return prediction.get_canonical_key() == reference_relation.get_canonical_key()
+
+    check_one_to_one_totals(
+        build_relation_correctness_matrix(
+            frozenset(predicted), frozenset(reference), overlap, one_to_one=True
+        ),
+        predicted,
+        reference,
+        compatible,
+    )
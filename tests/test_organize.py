@@ -0,0 +1,36 @@
+import random
+
+import pytest
+from random_annotations import random_tasks
+
+from lseval.instrumentation import instrument
+from lseval.utils import organize_corpus_annotations_by_annotator
+
+ID_TO_ANNOTATOR = {1: "a", 2: "b", 3: "c", 4: "d"}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_skipping_other_annotators_keeps_the_kept_corpora(seed):
+    tasks = random_tasks(random.Random(seed), 10, annotator_ids=(1, 2, 3, 4))
+    annotator_to_corpus = organize_corpus_annotations_by_annotator(
+        tasks, ID_TO_ANNOTATOR, [4]
+    )
+    with instrument() as report:
+        kept_annotator_to_corpus = organize_corpus_annotations_by_annotator(
+            tasks, ID_TO_ANNOTATOR, [4], annotators_to_keep=("a", "b")
+        )
+    assert kept_annotator_to_corpus == {
+        annotator: annotator_to_corpus[annotator] for annotator in ("a", "b")
+    }
+    # Both c's sets and the ignored d's sets are skipped unparsed
+    assert report.counters["annotation_sets_skipped"] == 2 * len(tasks)
+    assert report.counters["tasks_parsed"] == len(tasks)
+
+
+@pytest.mark.parametrize("annotators_to_keep", [None, ("a", "b")])
+def test_unmapped_annotator_ids_still_raise(annotators_to_keep):
+    tasks = random_tasks(random.Random(0), 3, annotator_ids=(1, 2, 9))
+    with pytest.raises(KeyError):
+        organize_corpus_annotations_by_annotator(
+            tasks, ID_TO_ANNOTATOR, [], annotators_to_keep=annotators_to_keep
+        )
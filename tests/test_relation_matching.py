@@ -0,0 +1,108 @@
+import random
+from dataclasses import replace
+
+import pytest
+from random_annotations import random_entities, random_relations
+
+from lseval.score import (
+    brute_force_overlap_relation_correctness_matrix,
+    build_relation_correctness_matrix,
+    build_relation_span_indices,
+    overlap_relation_alignments,
+)
+
+SEEDS = range(50)
+
+
+# Reference relations drawn over the same entities as the predictions,
+# some of them copies of predictions with their arguments swapped
+def random_relation_pair(seed):
+    rng = random.Random(seed)
+    entities = random_entities(rng, 0, rng.randint(2, 12), "e")
+    predicted = random_relations(rng, entities, rng.randint(0, 10))
+    reference = set(random_relations(rng, entities, rng.randint(0, 10)))
+    for relation in predicted:
+        if rng.random() < 0.3:
+            reference.add(replace(relation, arg1=relation.arg2, arg2=relation.arg1))
+    return predicted, frozenset(reference)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_overlap_relation_matching_matches_brute_force(seed):
+    predicted, reference = random_relation_pair(seed)
+    assert build_relation_correctness_matrix(
+        predicted, reference, overlap=True
+    ) == build_relation_correctness_matrix(
+        predicted, reference, overlap=True, brute_force=True
+    )
+    assert build_relation_correctness_matrix(
+        predicted, reference, overlap=True
+    ) == brute_force_overlap_relation_correctness_matrix(predicted, reference)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_overlap_relation_alignments_match_brute_force(seed):
+    predicted, reference = map(list, random_relation_pair(seed))
+    expected = {
+        (prediction_index, reference_index)
+        for prediction_index, prediction in enumerate(predicted)
+        for reference_index, relation in enumerate(reference)
+        if prediction.overlap_match(relation)
+    }
+    assert set(overlap_relation_alignments(predicted, reference)) == expected
+    assert (
+        set(
+            overlap_relation_alignments(
+                predicted, reference, build_relation_span_indices(reference)
+            )
+        )
+        == expected
+    )
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_relation_matching_matches_brute_force(seed):
+    predicted, reference = random_relation_pair(seed)
+    correctness_matrix = build_relation_correctness_matrix(
+        predicted, reference, overlap=False
+    )
+
+    def same_relation(first, second):
+        if first.label != second.label or first.directed != second.directed:
+            return False
+        if (first.arg1.span, first.arg2.span) == (second.arg1.span, second.arg2.span):
+            return True
+        return not first.directed and (first.arg1.span, first.arg2.span) == (
+            second.arg2.span,
+            second.arg1.span,
+        )
+
+    assert correctness_matrix.true_positives == {
+        relation
+        for relation in predicted
+        if any(same_relation(relation, other) for other in reference)
+    }
+    assert correctness_matrix.false_negatives == {
+        relation
+        for relation in reference
+        if not any(same_relation(relation, other) for other in predicted)
+    }
+
+
+def test_swapped_arguments_only_match_undirected():
+    entities = random_entities(random.Random(0), 0, 2, "e")
+    relation = next(iter(random_relations(random.Random(1), entities, 1)))
+    for directed in (False, True):
+        predicted = replace(relation, directed=directed)
+        swapped = replace(predicted, arg1=predicted.arg2, arg2=predicted.arg1)
+        for overlap in (False, True):
+            correctness_matrix = build_relation_correctness_matrix(
+                {predicted}, {swapped}, overlap=overlap
+            )
+            # Swapped, a directed relation is a different relation
+            if not directed:
+                assert correctness_matrix.is_true_positive(predicted)
+                assert not correctness_matrix.false_negatives
+            elif not overlap and predicted.arg1.span != predicted.arg2.span:
+                assert correctness_matrix.is_false_positive(predicted)
+                assert correctness_matrix.is_false_negative(swapped)
@@ -0,0 +1,83 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from lseval.adjudication import update_schema
+from lseval.datatypes import DocTimeRel
+from lseval.schema import DEFAULT_SCHEMA, TagKind, compile_label_config
+from lseval.utils import coordinate_attribute_entities_to_single
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schema.xml"
+
+
+def region_annotation(from_name, annotation_type, value):
+    return {
+        "id": "region",
+        "from_name": from_name,
+        "type": annotation_type,
+        "value": {"start": 0, "end": 4, "text": "dose", **value},
+    }
+
+
+REGION = [
+    region_annotation("Event", "labels", {"labels": ["Event"]}),
+    region_annotation("DocTimeRel", "choices", {"choices": ["BEFORE"]}),
+    region_annotation("CUI", "textarea", {"text": [" c0001 ", "C0000"]}),
+    region_annotation("IAA", "choices", {"choices": ["Agreement"]}),
+]
+
+
+def test_compiled_schema_decodes_like_the_default():
+    schema = compile_label_config(SCHEMA_PATH)
+    assert schema.from_name_to_decoder["Event"].kind == TagKind.LABELS
+    assert schema.get_decoder("IAA") is None
+    entity = coordinate_attribute_entities_to_single(0, REGION, schema=schema)
+    assert entity == coordinate_attribute_entities_to_single(0, REGION)
+    assert entity.label == "Event"
+    assert entity.text == "dose"
+    assert entity.dtr == DocTimeRel.BEFORE
+    assert entity.cuis == ("C0000", "C0001")
+
+
+def test_other_labels_tags_give_labels():
+    region = [
+        region_annotation("RadiotherapySignature", "labels", {"labels": ["Signature"]})
+    ]
+    assert coordinate_attribute_entities_to_single(0, region).label is None
+    assert (
+        coordinate_attribute_entities_to_single(
+            0, region, schema=compile_label_config(SCHEMA_PATH)
+        ).label
+        == "Signature"
+    )
+
+
+def test_attributes_is_deprecated_but_still_limits_tags():
+    with pytest.deprecated_call():
+        entity = coordinate_attribute_entities_to_single(0, REGION, {"Event"})
+    assert entity.label == "Event"
+    assert entity.dtr is None
+    assert entity.cuis == ()
+
+
+def test_core_attributes_is_deprecated_but_still_the_default_tags():
+    with pytest.deprecated_call():
+        from lseval.utils import CORE_ATTRIBUTES
+    assert CORE_ATTRIBUTES == {"Event", "DocTimeRel", "CUI"}
+    with pytest.deprecated_call():
+        entity = coordinate_attribute_entities_to_single(0, REGION, CORE_ATTRIBUTES)
+    assert entity == coordinate_attribute_entities_to_single(0, REGION)
+
+
+def test_update_schema_adds_annotators_once():
+    updated = update_schema(ET.parse(SCHEMA_PATH), "alice", "bob")
+    updated = update_schema(updated, "alice", "carol")
+    schema = compile_label_config(updated)
+    iaa_values = schema.from_name_to_decoder["IAA"].values
+    for annotator in ("Agreement", "alice", "bob", "carol"):
+        assert iaa_values.count(annotator) == 1
+        assert schema.relation_labels.count(annotator) == 1
+    # The original tree is left alone
+    assert "alice" not in compile_label_config(SCHEMA_PATH).relation_labels
+    assert schema.get_fingerprint() != DEFAULT_SCHEMA.get_fingerprint()
@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+import pytest
+from random_annotations import random_corpora
+
+from lseval.correctness_matrix import Correctness
+from lseval.score import count_corpora
+from lseval.threshold_curve import corpus_threshold_curves, dice_ratio, jaccard_ratio
+
+
+def curve_totals(curve, position):
+    return (
+        int(curve.true_positives[position]),
+        int(curve.false_positives[position]),
+        int(curve.false_negatives[position]),
+    )
+
+
+def corpus_totals(correctness_totals):
+    return (
+        correctness_totals[Correctness.TRUE_POSITIVE],
+        correctness_totals[Correctness.FALSE_POSITIVE],
+        correctness_totals[Correctness.FALSE_NEGATIVE],
+    )
+
+
+# t = 0 is overlap scoring and t = 1 exact scoring
+@pytest.mark.parametrize("ratio", [jaccard_ratio, dice_ratio])
+@pytest.mark.parametrize("seed", range(10))
+def test_curve_endpoints_match_overlap_and_exact_scoring(seed, ratio):
+    predicted_corpus, reference_corpus = random_corpora(random.Random(seed))
+    entity_curve, relation_curve = corpus_threshold_curves(
+        predicted_corpus, reference_corpus, ratio=ratio
+    )
+    assert entity_curve.thresholds[0] == 0.0
+    assert entity_curve.thresholds[-1] == 1.0
+    for position, overlap in ((0, True), (-1, False)):
+        entity_totals, relation_totals = count_corpora(
+            predicted_corpus, reference_corpus, overlap=overlap
+        )
+        assert curve_totals(entity_curve, position) == corpus_totals(entity_totals)
+        assert curve_totals(relation_curve, position) == corpus_totals(relation_totals)
+
+
+def test_curve_is_monotone():
+    predicted_corpus, reference_corpus = random_corpora(random.Random(0))
+    for curve in corpus_threshold_curves(predicted_corpus, reference_corpus):
+        assert np.all(np.diff(curve.true_positives) <= 0)
+        assert np.all(np.diff(curve.false_negatives) >= 0)